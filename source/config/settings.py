@@ -19,6 +19,18 @@ class AppSettings:
     FRAMES_PER_ROW: int = 32
     MAX_WORKERS: int = 4
     DEFAULT_FONT_SIZE: int = 16
+    SHEET_CACHE_MAX_MB: int = 256
+    RENDER_ENGINE: str = "pillow"
+    RECOLOR_FAST_PATH: bool = False
+    PNG_PROFILE: str = "rgba"
+    PNG_ENCODER_THREADS: int = 2
+    PNG_STREAM_MIN_MB: int = 64
+    LINK_SHARED_ASSETS: bool = False
+    COMPACT_JSON: bool = False
+    MERGE_FRAMES: bool = False
+    TRIM_MODE: str = "global"
+    DEDUP_TOLERANCE: int = 0
+    DEDUP_MIRRORED: bool = False
     
     # Debug
     ENABLE_DEBUG_FRAMES: bool = False
@@ -40,6 +52,17 @@ class AppSettings:
         settings.FRAMES_PER_ROW = args.frames_per_row
         settings.ENABLE_DEBUG_FRAMES = args.debug_frames
         settings.MAX_WORKERS = args.workers
+        settings.RENDER_ENGINE = args.render_engine
+        settings.RECOLOR_FAST_PATH = args.recolor_fast_path
+        settings.PNG_PROFILE = args.png_profile
+        settings.PNG_ENCODER_THREADS = args.encoder_threads
+        settings.PNG_STREAM_MIN_MB = args.stream_threshold_mb
+        settings.LINK_SHARED_ASSETS = args.link_shared_assets
+        settings.COMPACT_JSON = args.compact_json
+        settings.MERGE_FRAMES = args.merge_frames
+        settings.TRIM_MODE = args.trim_mode
+        settings.DEDUP_TOLERANCE = args.dedup_tolerance
+        settings.DEDUP_MIRRORED = args.dedup_mirrored
         
         # Set debug output directory if debug mode is enabled
         if args.debug_frames:
@@ -4,4 +4,5 @@ from .animation_models import (
     StardewAnimationRangeStartEnd, StardewAnimationRangeStartNegativeEnd,
     StardewAnimationPortrait, StardewAnimationRepeatFrameCount,
     AnimationData, StardewMap, AnimationSet
-)
\ No newline at end of file
+)
+from .body_model import BodyModel, write_body_models, merge_repeated_frames
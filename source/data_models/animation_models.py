@@ -3,7 +3,7 @@
 
 import os
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from .enums import StardewAnimationDataModes, StardewBodyModelType
 from PIL import Image
 
@@ -102,28 +102,31 @@ class AnimationSet:
     stardew_animations: List[StardewMap] = field(default_factory=list)
     global_offsets: Dict = field(default_factory=dict)
 
-    def calculate_frame_indices(self, animation: AnimationData, stardew_map: StardewAnimationData) -> Dict[str, List[int]]:
-        total_frames = animation.total_frames
-        
+    def read_sheet_size(self, animation: AnimationData) -> Optional[Tuple[int, int]]:
         sprite_path = os.path.join(self.directory, animation.anim_path)
-        actual_rows = 8
-        frames_per_row = total_frames
-        
         try:
             with Image.open(sprite_path) as sprite:
-                sprite_height = sprite.height
-                sprite_width = sprite.width
-                
-                actual_rows = sprite_height // animation.frame_height
-                frames_per_row = sprite_width // animation.frame_width
-                
-                if frames_per_row < total_frames:
-                    total_frames = frames_per_row
-                
-                print(f"📊 {animation.name}: {actual_rows} rows, {frames_per_row} frames per row")
-                
+                return sprite.size
         except Exception as e:
             print(f"⚠️ Could not open sprite {sprite_path} to determine rows: {e}")
+            return None
+
+    def calculate_frame_indices_for_size(self, animation: AnimationData, stardew_map: StardewAnimationData, sheet_size: Optional[Tuple[int, int]]) -> Dict[str, List[int]]:
+        total_frames = animation.total_frames
+        
+        actual_rows = 8
+        frames_per_row = total_frames
+        
+        if sheet_size:
+            sprite_width, sprite_height = sheet_size
+            
+            actual_rows = sprite_height // animation.frame_height
+            frames_per_row = sprite_width // animation.frame_width
+            
+            if frames_per_row < total_frames:
+                total_frames = frames_per_row
+            
+            print(f"📊 {animation.name}: {actual_rows} rows, {frames_per_row} frames per row")
         
         base_indices = {
             'front': 0,
@@ -216,71 +219,107 @@ class AnimationSet:
         width_diff = abs(anim2.frame_width - anim1.frame_width)
         return width_diff / 2.0
 
-    def filter_animations_for_stardew(self, pokemon_id: str, log_file="stardew_missing.log"):
-        from config.stardew_config import load_stardew_mapping_config
-        
+    def filter_animations_for_stardew(self, pokemon_id: str, missing_report=None):
         is_custom = self.pokemon_id == "-1"
-        stardew_mapping, global_offsets = load_stardew_mapping_config(pokemon_id, self.pokemon_name, is_custom)
         
-        filtered_list = []
-        with open(log_file, "a", encoding="utf-8") as log:
-            for entry in stardew_mapping:
-                stardew_anim_name = entry.stardew_anim_name
-                fallbacks = entry.fallback_names
-                found = False
-                
-                last_fallback_anim = None
-                for fallback_name in reversed(fallbacks):
-                    last_fallback_anim = next((a for a in self.animations if a.name == fallback_name), None)
-                    if last_fallback_anim:
+        # Recolor variants share the same config, animations and sheet sizes, so the fallback
+        # selection and frame index tables only need to be resolved once per unique layout
+        sheet_sizes = {}
+        for anim in self.animations:
+            if anim.anim_path not in sheet_sizes:
+                sheet_sizes[anim.anim_path] = self.read_sheet_size(anim)
+        
+        cache_key = (
+            (pokemon_id, self.pokemon_name, is_custom),
+            tuple((a.name, a.anim_path, a.frame_width, a.frame_height, a.total_frames) for a in self.animations),
+            tuple(sorted(sheet_sizes.items()))
+        )
+        
+        cached = _stardew_selection_cache.get(cache_key)
+        if cached is None:
+            from config.stardew_config import load_stardew_mapping_config
+            stardew_mapping, global_offsets = load_stardew_mapping_config(pokemon_id, self.pokemon_name, is_custom)
+            selections, missing = self.select_stardew_animations(stardew_mapping, sheet_sizes)
+            cached = (global_offsets, selections, missing)
+            _stardew_selection_cache[cache_key] = cached
+        else:
+            print(f"♻️ {self.variant_name}: Reusing cached Stardew animation selection ({len(cached[1])} animations)")
+        
+        global_offsets, selections, missing = cached
+        
+        self.stardew_animations = [
+            StardewMap(
+                stardew_anim_name=entry.stardew_anim_name,
+                pokemon_anim_name=pokemon_anim_name,
+                stardew_map=entry,
+                pokemon_frames_index_front=list(frame_indices['front']),
+                pokemon_frames_index_right=list(frame_indices['right']),
+                pokemon_frames_index_back=list(frame_indices['back']),
+                pokemon_frames_index_left=list(frame_indices['left'])
+            )
+            for entry, pokemon_anim_name, frame_indices in selections
+        ]
+        
+        if missing_report is None:
+            from utils.coverage_report import missing_animation_report
+            missing_report = missing_animation_report
+        missing_report.record_variant(self.variant_name, len(selections), missing)
+        for stardew_anim_name, fallbacks in missing:
+            print(f"  ⚠️ {self.variant_name}: Missing Pokémon animation for Stardew '{stardew_anim_name}' with fallbacks {fallbacks}")
+        
+        return dict(global_offsets)
+
+    def select_stardew_animations(self, stardew_mapping: List[StardewAnimationData], sheet_sizes: Dict[str, Optional[Tuple[int, int]]]) -> Tuple[list, list]:
+        """Resolve the fallback animation and frame indices for every Stardew entry"""
+        animations_by_name = {}
+        for anim in self.animations:
+            animations_by_name.setdefault(anim.name, anim)
+        
+        selections = []
+        missing = []
+        for entry in stardew_mapping:
+            stardew_anim_name = entry.stardew_anim_name
+            fallbacks = entry.fallback_names
+            
+            # Last available fallback, used as width reference and as last resort
+            last_fallback_anim = None
+            for fallback_name in reversed(fallbacks):
+                last_fallback_anim = animations_by_name.get(fallback_name)
+                if last_fallback_anim:
+                    break
+            
+            selected_anim = None
+            for fallback_name in fallbacks:
+                anim = animations_by_name.get(fallback_name)
+                if anim:
+                    if entry.discard_distance <= 0:
+                        selected_anim = anim
                         break
-                
-                if not last_fallback_anim:
-                    for fallback_name in fallbacks:
-                        last_fallback_anim = next((a for a in self.animations if a.name == fallback_name), None)
-                        if last_fallback_anim:
-                            break
-                
-                selected_anim = None
-                for fallback_name in fallbacks:
-                    anim = next((a for a in self.animations if a.name == fallback_name), None)
-                    if anim:
-                        if entry.discard_distance <= 0:
-                            selected_anim = anim
-                            break
+                    
+                    if last_fallback_anim:
+                        width_diff = self.calculate_width_difference(last_fallback_anim, anim)
                         
-                        if last_fallback_anim:
-                            width_diff = self.calculate_width_difference(last_fallback_anim, anim)
-                            
-                            if width_diff <= entry.discard_distance:
-                                selected_anim = anim
-                                print(f"  ✅ {stardew_anim_name}: Selected '{anim.name}' (width diff: {width_diff:.1f} <= {entry.discard_distance})")
-                                break
-                            else:
-                                print(f"  ⚠️ {stardew_anim_name}: Discarded '{anim.name}' (width diff: {width_diff:.1f} > {entry.discard_distance})")
-                        else:
+                        if width_diff <= entry.discard_distance:
                             selected_anim = anim
+                            print(f"  ✅ {stardew_anim_name}: Selected '{anim.name}' (width diff: {width_diff:.1f} <= {entry.discard_distance})")
                             break
-                
-                if not selected_anim and last_fallback_anim:
-                    selected_anim = last_fallback_anim
-                    print(f"  🔄 {stardew_anim_name}: Using last fallback '{selected_anim.name}' (no suitable animation found)")
-                
-                if selected_anim:
-                    frame_indices = self.calculate_frame_indices(selected_anim, entry)
-                    
-                    filtered_list.append(
-                        StardewMap(
-                            stardew_anim_name=entry.stardew_anim_name, 
-                            pokemon_anim_name=selected_anim.name,
-                            stardew_map=entry,
-                            pokemon_frames_index_front=frame_indices['front'],
-                            pokemon_frames_index_right=frame_indices['right'],
-                            pokemon_frames_index_back=frame_indices['back'],
-                            pokemon_frames_index_left=frame_indices['left']
-                        ))
-                    found = True
-                else:
-                    log.write(f"{self.variant_name}: Missing Pokémon animation for Stardew '{stardew_anim_name}' with fallbacks {fallbacks}\n")
-        self.stardew_animations = filtered_list
-        return global_offsets
\ No newline at end of file
+                        else:
+                            print(f"  ⚠️ {stardew_anim_name}: Discarded '{anim.name}' (width diff: {width_diff:.1f} > {entry.discard_distance})")
+                    else:
+                        selected_anim = anim
+                        break
+            
+            if not selected_anim and last_fallback_anim:
+                selected_anim = last_fallback_anim
+                print(f"  🔄 {stardew_anim_name}: Using last fallback '{selected_anim.name}' (no suitable animation found)")
+            
+            if selected_anim:
+                frame_indices = self.calculate_frame_indices_for_size(selected_anim, entry, sheet_sizes.get(selected_anim.anim_path))
+                selections.append((entry, selected_anim.name, frame_indices))
+            else:
+                missing.append((stardew_anim_name, fallbacks))
+        
+        return selections, missing
+
+# Resolved Stardew selections keyed by (config identity, animation layout, sheet sizes), kept for the whole run
+_stardew_selection_cache: Dict[tuple, tuple] = {}
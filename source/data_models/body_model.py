@@ -0,0 +1,125 @@
+# Author: HeartoLazor
+# Description: In-memory body.json model shared by the generation and optimization stages
+
+import os
+import copy
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+BODY_TYPES = ["FrontBody", "RightBody", "BackBody", "LeftBody"]
+ANIMATION_LISTS = ["IdleAnimation", "MovementAnimation"]
+
+def _can_merge(frame: Dict) -> bool:
+    return isinstance(frame.get('Duration'), (int, float)) and not frame.get('EndWhenFarmerFrameUpdates', False)
+
+def _frame_identity(frame: Dict) -> str:
+    return json.dumps({key: value for key, value in frame.items() if key not in ('Duration', 'Comment')}, sort_keys=True)
+
+@dataclass
+class BodyModel:
+    """
+    body.json contents: top level keys (Name, Tags, ...) and one dict per body type (FrontBody, RightBody,
+    BackBody, LeftBody) holding BodySize, Flipped, Portrait and the IdleAnimation/MovementAnimation frame lists.
+    Every stage edits this model and it is serialized once after all the stages.
+    """
+    data: Dict = field(default_factory=dict, repr=False)
+    modified: bool = False
+
+    @classmethod
+    def from_text(cls, text: str) -> 'BodyModel':
+        return cls(data=json.loads(text))
+
+    @classmethod
+    def load(cls, body_json_path: str) -> 'BodyModel':
+        with open(body_json_path, 'r', encoding='utf-8') as f:
+            return cls.from_text(f.read())
+
+    def mark_modified(self):
+        self.modified = True
+
+    def replace_with(self, other: 'BodyModel', keep_keys: Tuple[str, ...] = ()):
+        """Copy the contents of another model, keeping some top level keys (e.g. Name, Tags)"""
+        data = copy.deepcopy(other.data)
+        for key in keep_keys:
+            if key in self.data:
+                data[key] = self.data[key]
+        self.data = data
+        self.mark_modified()
+
+    def body_types(self) -> Iterator[Tuple[str, Dict]]:
+        """(name, body) of the body types present (FrontBody, RightBody, BackBody, LeftBody)"""
+        for body_type in BODY_TYPES:
+            if body_type in self.data:
+                yield body_type, self.data[body_type]
+
+    def animation_frames(self) -> Iterator[Tuple[str, str, List[Dict]]]:
+        """(body type, animation list name, frames) of every animation list"""
+        for body_type, body in self.body_types():
+            for animation_list in ANIMATION_LISTS:
+                if animation_list in body:
+                    yield body_type, animation_list, body[animation_list]
+
+    def merge_repeated_frames(self) -> int:
+        """
+        Merge consecutive entries showing the same frame (same Frame, Offset, Conditions and other keys, the Comment aside)
+        into one entry lasting their summed Duration. Entries that end when the farmer frame updates are kept apart.
+        Returns the number of entries removed.
+        """
+        removed = 0
+        for _, _, frames in self.animation_frames():
+            merged = []
+            for frame in frames:
+                previous = merged[-1] if merged else None
+                if (previous is not None and _can_merge(previous) and _can_merge(frame) and
+                        _frame_identity(previous) == _frame_identity(frame)):
+                    previous['Duration'] += frame['Duration']
+                    continue
+                merged.append(frame)
+            
+            if len(merged) != len(frames):
+                removed += len(frames) - len(merged)
+                frames[:] = merged
+        
+        if removed:
+            self.mark_modified()
+        return removed
+
+    def portrait(self) -> Optional[Dict]:
+        return self.data.get('FrontBody', {}).get('Portrait')
+
+    def to_json(self, compact: bool = False) -> str:
+        if compact:
+            return json.dumps(self.data, separators=(',', ':'), ensure_ascii=False)
+        return json.dumps(self.data, indent=2, ensure_ascii=False)
+
+    def write(self, body_json_path: str, compact: bool = False):
+        with open(body_json_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json(compact))
+
+def write_body_models(spritesheet_mapping: Dict, compact: bool = False) -> int:
+    """Write the body.json of every variant, the only place body.json is written. Returns the written count"""
+    written = 0
+    for variant_name, sprite_data in spritesheet_mapping.items():
+        body_model = sprite_data.get('body_model')
+        if body_model is None:
+            continue
+        try:
+            body_model.write(os.path.join(sprite_data['directory'], "body.json"), compact)
+            written += 1
+        except Exception as e:
+            print(f"❌ Failed to write body.json for {variant_name}: {e}")
+    return written
+
+def merge_repeated_frames(spritesheet_mapping: Dict) -> int:
+    """Merge the repeated consecutive frame entries of every variant body model, returns the removed entry count"""
+    removed = 0
+    for variant_name, sprite_data in spritesheet_mapping.items():
+        body_model = sprite_data.get('body_model')
+        if body_model is None:
+            continue
+        variant_removed = body_model.merge_repeated_frames()
+        if variant_removed:
+            print(f"🧮 {variant_name}: merged {variant_removed} repeated frame entries")
+        removed += variant_removed
+    return removed
@@ -1,3 +1,3 @@
 from .xml_parser import find_animdata_files, parse_animdata_xml, determine_pokemon_info_from_path
 from .json_generator import generate_body_json
-from .template_loader import load_template
\ No newline at end of file
+from .template_loader import load_template, get_template, CompiledTemplate
\ No newline at end of file
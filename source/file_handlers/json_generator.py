@@ -3,10 +3,11 @@
 
 import os
 from data_models.animation_models import AnimationSet
+from data_models.body_model import BodyModel
 from typing import Dict
 from data_models.enums import StardewBodyModelType, StardewAnimationDataModes
 from config.settings import app_settings
-from .template_loader import load_template
+from .template_loader import get_template
 
 def get_json_frame_sequence(stardew_anim, base_idx, frames_count):
     """Get frame sequence for JSON generation (applies mode-specific rules)"""
@@ -80,14 +81,10 @@ def generate_single_frame_data(stardew_anim, pokemon_anim, pokemon_frame_idx, bo
     
     conditions_data = []
     for condition_name in stardew_anim.stardew_map.conditions_names:
-        condition_data = condition_template.replace("{{condition_type}}", "Name")
-        condition_data = condition_data.replace("{{condition_name}}", condition_name)
-        conditions_data.append(condition_data)
+        conditions_data.append(condition_template.render(condition_type="Name", condition_name=condition_name))
     
     for group_name in stardew_anim.stardew_map.conditions_group_names:
-        condition_data = condition_template.replace("{{condition_type}}", "GroupName")
-        condition_data = condition_data.replace("{{condition_name}}", group_name)
-        conditions_data.append(condition_data)
+        conditions_data.append(condition_template.render(condition_type="GroupName", condition_name=group_name))
     
     if conditions_data:
         conditions_str = ",\n".join(conditions_data)
@@ -97,28 +94,28 @@ def generate_single_frame_data(stardew_anim, pokemon_anim, pokemon_frame_idx, bo
     final_offset_x = frame_offset_x + pokemon_sprite_offset_x + stardew_anim.stardew_map.sprite_offset_x
     final_offset_y = frame_offset_y + pokemon_sprite_offset_y + stardew_anim.stardew_map.sprite_offset_y
     
-    frame_data = frame_template.replace("{{body_frame_number}}", str(body_frame_number))
-    frame_data = frame_data.replace("{{stardew_animation_name}}", stardew_anim.stardew_anim_name)
-    frame_data = frame_data.replace("{{pokemon_frame_number}}", str(pokemon_frame_idx))
-    frame_data = frame_data.replace("{{pokemon_animation_name}}", pokemon_anim.anim_path)
-    frame_data = frame_data.replace("{{duration}}", str(int(duration)))
-    frame_data = frame_data.replace("{{end_when_farmer_frame_updates}}", str(stardew_anim.stardew_map.end_when_farmer_frame_updates).lower())
-    frame_data = frame_data.replace("{{ingame_frame_offset_x}}", str(final_offset_x))
-    frame_data = frame_data.replace("{{ingame_frame_offset_y}}", str(final_offset_y))
-    frame_data = frame_data.replace("{{conditions}}", conditions_str)
-    
-    return frame_data
+    return frame_template.render(
+        body_frame_number=body_frame_number,
+        stardew_animation_name=stardew_anim.stardew_anim_name,
+        pokemon_frame_number=pokemon_frame_idx,
+        pokemon_animation_name=pokemon_anim.anim_path,
+        duration=int(duration),
+        end_when_farmer_frame_updates=str(stardew_anim.stardew_map.end_when_farmer_frame_updates).lower(),
+        ingame_frame_offset_x=final_offset_x,
+        ingame_frame_offset_y=final_offset_y,
+        conditions=conditions_str
+    )
 
 def generate_body_json(anim_set: AnimationSet, spritesheet_data: Dict, output_dir: str):
     print(f"🛠️ Generating body.json for {anim_set.variant_name}")
     
     try:
-        body_template = load_template("body.template")
-        body_type_template = load_template("body_type.template")
-        animation_template = load_template("animation.template")
-        frame_template = load_template("frame.template")
-        condition_template = load_template("condition.template")
-        portrait_template = load_template("portrait.template")
+        body_template = get_template("body.template")
+        body_type_template = get_template("body_type.template")
+        animation_template = get_template("animation.template")
+        frame_template = get_template("frame.template")
+        condition_template = get_template("condition.template")
+        portrait_template = get_template("portrait.template")
         
         print(f"✅ All templates loaded successfully")
         
@@ -249,7 +246,15 @@ def generate_body_json(anim_set: AnimationSet, spritesheet_data: Dict, output_di
                         
                         # For ALL modes, use the actual frame number from the spritesheet
                         # Don't create new frame numbers - reuse what's already in the spritesheet
-                        actual_body_frame = actual_start_index + frames_before_this_direction + relative_frame_idx
+                        anim_cells = anim_mapping_data.get('cells')
+                        if anim_cells is not None:
+                            # Cells planned at render time, frames of the same source frame share a cell
+                            cell_slot = frames_before_this_direction + relative_frame_idx
+                            actual_body_frame = anim_cells[cell_slot] if cell_slot < len(anim_cells) else None
+                            if actual_body_frame is None:
+                                continue
+                        else:
+                            actual_body_frame = actual_start_index + frames_before_this_direction + relative_frame_idx
                         
                         frame_data = generate_single_frame_data(
                             stardew_anim, pokemon_anim, actual_sprite_idx, 
@@ -281,7 +286,7 @@ def generate_body_json(anim_set: AnimationSet, spritesheet_data: Dict, output_di
                 print(f"  📋 {stardew_anim.stardew_anim_name}: Generated {len(json_frames_data)} JSON frames reusing {unique_frames_count} sprite frames")
 
                 frames_joined = ",\n".join(frames_data)
-                animation_data = animation_template.replace("{{frames}}", frames_joined)
+                animation_data = animation_template.render(frames=frames_joined)
                 
                 if stardew_anim.stardew_map.body_type == StardewBodyModelType.idle_animation:
                     idle_animations.append(animation_data)
@@ -303,27 +308,31 @@ def generate_body_json(anim_set: AnimationSet, spritesheet_data: Dict, output_di
                         portrait_offset_x = portrait_anim.stardew_map.portrait_offset_x + pokemon_portrait_offset_x
                         portrait_offset_y = portrait_anim.stardew_map.portrait_offset_y + pokemon_portrait_offset_y
                         
-                        portrait_data = portrait_template.replace("{{portrait_x}}", str(col * pokemon_anim.frame_width))
-                        portrait_data = portrait_data.replace("{{portrait_y}}", str(row * pokemon_anim.frame_height))
-                        portrait_data = portrait_data.replace("{{max_width}}", str(anim_set.max_width))
-                        portrait_data = portrait_data.replace("{{max_height}}", str(anim_set.max_height))
-                        portrait_data = portrait_data.replace("{{ingame_portrait_offset_x}}", str(-anim_set.max_width + portrait_offset_x))
-                        portrait_data = portrait_data.replace("{{ingame_portrait_offset_y}}", str(-(anim_set.max_height + offset_y) + portrait_offset_y))
+                        portrait_data = portrait_template.render(
+                            portrait_x=col * pokemon_anim.frame_width,
+                            portrait_y=row * pokemon_anim.frame_height,
+                            max_width=anim_set.max_width,
+                            max_height=anim_set.max_height,
+                            ingame_portrait_offset_x=-anim_set.max_width + portrait_offset_x,
+                            ingame_portrait_offset_y=-(anim_set.max_height + offset_y) + portrait_offset_y
+                        )
                         print(f"  ✅ Portrait data generated with offsets X:{portrait_offset_x}, Y:{portrait_offset_y}")
             
-            body_type_data = body_type_template.replace("{{body_type}}", body_type_name)
-            body_type_data = body_type_data.replace("{{flipped}}", str(flipped).lower())
-            body_type_data = body_type_data.replace("{{max_width}}", str(anim_set.max_width))
-            body_type_data = body_type_data.replace("{{max_height}}", str(anim_set.max_height))
-            body_type_data = body_type_data.replace("{{accessory_offset}}", str(accessory_offset))
-            body_type_data = body_type_data.replace("{{head_offset}}", str(head_offset))
-            body_type_data = body_type_data.replace("{{leg_offset}}", str(leg_offset))
-            body_type_data = body_type_data.replace("{{shoe_offset}}", str(shoe_offset))
-            body_type_data = body_type_data.replace("{{body_offset}}", str(body_offset))
-            body_type_data = body_type_data.replace("{{arms_offset}}", str(arms_offset))
-            body_type_data = body_type_data.replace("{{portrait}}", portrait_data)
-            body_type_data = body_type_data.replace("{{idle_animations}}", ",\n".join(idle_animations) if idle_animations else "")
-            body_type_data = body_type_data.replace("{{movement_animations}}", ",\n".join(movement_animations) if movement_animations else "")
+            body_type_data = body_type_template.render(
+                body_type=body_type_name,
+                flipped=str(flipped).lower(),
+                max_width=anim_set.max_width,
+                max_height=anim_set.max_height,
+                accessory_offset=accessory_offset,
+                head_offset=head_offset,
+                leg_offset=leg_offset,
+                shoe_offset=shoe_offset,
+                body_offset=body_offset,
+                arms_offset=arms_offset,
+                portrait=portrait_data,
+                idle_animations=",\n".join(idle_animations),
+                movement_animations=",\n".join(movement_animations)
+            )
             
             body_types_data[body_type_name.lower()] = body_type_data
             print(f"  ✅ {body_type_name} completed with {len(idle_animations)} idle, {len(movement_animations)} movement animations")
@@ -350,18 +359,19 @@ def generate_body_json(anim_set: AnimationSet, spritesheet_data: Dict, output_di
 
         tags_str = "    " + ",\n    ".join(tags)
 
-        body_json = body_template.replace("{{pokemon_id_name}}", anim_set.variant_name)
-        body_json = body_json.replace("{{pokemon_tags}}", tags_str)
-        body_json = body_json.replace("{{front_body_type}}", body_types_data.get("frontbody", ""))
-        body_json = body_json.replace("{{right_body_type}}", body_types_data.get("rightbody", ""))
-        body_json = body_json.replace("{{back_body_type}}", body_types_data.get("backbody", ""))
-        body_json = body_json.replace("{{left_body_type}}", body_types_data.get("leftbody", ""))
+        body_json = body_template.render(
+            pokemon_id_name=anim_set.variant_name,
+            pokemon_tags=tags_str,
+            front_body_type=body_types_data.get("frontbody", ""),
+            right_body_type=body_types_data.get("rightbody", ""),
+            back_body_type=body_types_data.get("backbody", ""),
+            left_body_type=body_types_data.get("leftbody", "")
+        )
         
-        output_path = os.path.join(output_dir, "body.json")
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(body_json)
+        # The templates are parsed once into the body model, later stages edit it and it's written at the end
+        spritesheet_data['body_model'] = BodyModel.from_text(body_json)
         
-        print(f"✅ Generated body.json: {output_path}")
+        print(f"✅ Generated body.json model: {os.path.join(output_dir, 'body.json')}")
         
     except Exception as e:
         print(f"❌ Failed to generate body.json for {anim_set.variant_name}: {e}")
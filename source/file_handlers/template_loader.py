@@ -1,9 +1,13 @@
 # Author: HeartoLazor
-# Description: Template file loader
+# Description: Template file loader and compiled template cache
 
+import re
+from functools import lru_cache
 from pathlib import Path
 from config.settings import app_settings
 
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
 def load_template(template_name: str) -> str:
     template_paths = [
         app_settings.TEMPLATES_DIR / template_name,
@@ -17,4 +21,32 @@ def load_template(template_name: str) -> str:
             with open(template_path, 'r', encoding='utf-8') as f:
                 return f.read()
     
-    raise FileNotFoundError(f"Template '{template_name}' not found in any of the expected locations")
\ No newline at end of file
+    raise FileNotFoundError(f"Template '{template_name}' not found in any of the expected locations")
+
+class CompiledTemplate:
+    """
+    Template pre-split into literal and {{placeholder}} segments, rendered with a single join.
+    Placeholders without a value are kept as they are in the output.
+    """
+    def __init__(self, text: str):
+        segments = PLACEHOLDER_PATTERN.split(text)
+        self.literals = segments[0::2]
+        self.placeholders = segments[1::2]
+        self._head = self.literals[0]
+        self._segments = list(zip(self.placeholders, self.literals[1:]))
+    
+    def render(self, **values) -> str:
+        if None not in values.values():
+            try:
+                return self._head + "".join([str(values[name]) + literal for name, literal in self._segments])
+            except KeyError:
+                pass
+        return self._head + "".join([
+            ("{{" + name + "}}" if values.get(name) is None else str(values[name])) + literal
+            for name, literal in self._segments
+        ])
+
+@lru_cache(maxsize=None)
+def get_template(template_name: str) -> CompiledTemplate:
+    """Load and compile a template once per process"""
+    return CompiledTemplate(load_template(template_name))
@@ -1,4 +1,5 @@
 from .sprite_processor import generate_spritesheets
 from .draw_utils import draw_debug_text
+from .frame_blitter import FramePlacement, compose_spritesheet, compose_spritesheet_bands, placement_content_box, crop_placements
 
-__all__ = ['generate_spritesheets', 'draw_debug_text']
\ No newline at end of file
+__all__ = ['generate_spritesheets', 'draw_debug_text', 'FramePlacement', 'compose_spritesheet', 'compose_spritesheet_bands', 'placement_content_box', 'crop_placements']
\ No newline at end of file
@@ -0,0 +1,185 @@
+# Author: HeartoLazor
+# Description: Spritesheet frame composition engines (Pillow and optional NumPy)
+
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from typing import Iterator, List, Optional, Tuple
+from PIL import Image, ImageOps
+from utils.sheet_cache import sprite_sheet_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RENDER_ENGINES = ["pillow", "numpy"]
+
+@dataclass
+class FramePlacement:
+    """One planned output frame: a source frame box copied into a spritesheet cell"""
+    sheet_path: str
+    source_box: Tuple[int, int, int, int]
+    flip: bool
+    cell_x: int
+    cell_y: int
+    offset_x: int
+    offset_y: int
+
+# Pixels pasted with themselves as mask on a transparent cell keep alpha DIV255(alpha * alpha),
+# so faint pixels disappear. Visible lookup table of the pasted alpha.
+_PASTED_VISIBLE_LUT = [255 if ((a * a + 128) + ((a * a + 128) >> 8)) >> 8 else 0 for a in range(256)]
+
+def placement_content_box(placements: List[FramePlacement], cell_width: int, cell_height: int) -> Optional[Tuple[int, int, int, int]]:
+    """Union bounding box, in cell coordinates, of the pixels drawn by all the placements (None if nothing is drawn)"""
+    frame_boxes = {}
+    content_box = None
+    
+    for placement in placements:
+        key = (placement.sheet_path, placement.source_box, placement.flip)
+        if key not in frame_boxes:
+            try:
+                frame = sprite_sheet_cache.get(placement.sheet_path).crop(placement.source_box)
+                bbox = frame.getchannel('A').point(_PASTED_VISIBLE_LUT).getbbox()
+            except Exception as e:
+                print(f"⚠️ Error reading frame {placement.source_box} from {placement.sheet_path}: {e}")
+                bbox = None
+            if bbox and placement.flip:
+                frame_width = placement.source_box[2] - placement.source_box[0]
+                bbox = (frame_width - bbox[2], bbox[1], frame_width - bbox[0], bbox[3])
+            frame_boxes[key] = bbox
+        
+        bbox = frame_boxes[key]
+        if not bbox:
+            continue
+        
+        # Clip to the cell, same as the paste does
+        x0 = max(bbox[0] + placement.offset_x, 0)
+        y0 = max(bbox[1] + placement.offset_y, 0)
+        x1 = min(bbox[2] + placement.offset_x, cell_width)
+        y1 = min(bbox[3] + placement.offset_y, cell_height)
+        if x0 >= x1 or y0 >= y1:
+            continue
+        
+        if content_box is None:
+            content_box = (x0, y0, x1, y1)
+        else:
+            content_box = (min(content_box[0], x0), min(content_box[1], y0), max(content_box[2], x1), max(content_box[3], y1))
+    
+    return content_box
+
+def crop_placements(placements: List[FramePlacement], content_box: Tuple[int, int, int, int],
+                    cell_width: int, cell_height: int) -> List[FramePlacement]:
+    """Move the placements into cells cropped to the content box, keeping their grid position"""
+    min_x, min_y, max_x, max_y = content_box
+    new_width = max_x - min_x
+    new_height = max_y - min_y
+    return [replace(placement,
+                    cell_x=(placement.cell_x // cell_width) * new_width,
+                    cell_y=(placement.cell_y // cell_height) * new_height,
+                    offset_x=placement.offset_x - min_x,
+                    offset_y=placement.offset_y - min_y)
+            for placement in placements]
+
+def resolve_render_engine(engine: str) -> str:
+    """Return the engine that will be used, falling back to Pillow if NumPy is not installed"""
+    if engine == "numpy" and np is None:
+        print("⚠️ NumPy is not installed, using the Pillow render engine")
+        return "pillow"
+    return engine
+
+def compose_spritesheet(placements: List[FramePlacement], sheet_width: int, sheet_height: int,
+                        cell_width: int, cell_height: int, engine: str = "pillow") -> Image.Image:
+    """Compose all planned frames into a new RGBA spritesheet"""
+    if resolve_render_engine(engine) == "numpy":
+        return compose_spritesheet_numpy(placements, sheet_width, sheet_height, cell_width, cell_height)
+    return compose_spritesheet_pillow(placements, sheet_width, sheet_height, cell_width, cell_height)
+
+def compose_spritesheet_bands(placements: List[FramePlacement], sheet_width: int, sheet_height: int,
+                              cell_width: int, cell_height: int, engine: str = "pillow") -> Iterator[Image.Image]:
+    """Compose the spritesheet one row of cells at a time, top to bottom"""
+    rows = defaultdict(list)
+    for placement in placements:
+        rows[placement.cell_y // cell_height].append(replace(placement, cell_y=0))
+
+    for row in range(sheet_height // cell_height):
+        yield compose_spritesheet(rows.get(row, []), sheet_width, cell_height, cell_width, cell_height, engine)
+
+def compose_spritesheet_pillow(placements: List[FramePlacement], sheet_width: int, sheet_height: int,
+                               cell_width: int, cell_height: int) -> Image.Image:
+    spritesheet = Image.new('RGBA', (sheet_width, sheet_height), (0, 0, 0, 0))
+
+    for placement in placements:
+        try:
+            source_sheet = sprite_sheet_cache.get(placement.sheet_path)
+            frame = source_sheet.crop(placement.source_box)
+
+            if placement.flip:
+                frame = ImageOps.mirror(frame)
+
+            final_frame = Image.new('RGBA', (cell_width, cell_height), (0, 0, 0, 0))
+            final_frame.paste(frame, (placement.offset_x, placement.offset_y), frame)
+
+            spritesheet.paste(final_frame, (placement.cell_x, placement.cell_y))
+        except Exception as e:
+            print(f"⚠️ Error composing frame {placement.source_box} from {placement.sheet_path}: {e}")
+
+    return spritesheet
+
+def compose_spritesheet_numpy(placements: List[FramePlacement], sheet_width: int, sheet_height: int,
+                              cell_width: int, cell_height: int) -> Image.Image:
+    """
+    Gather every planned frame straight into the destination array.
+    Frames sharing source sheet and geometry are copied in one batched operation,
+    the result is byte identical to the Pillow engine (alpha masked paste on a transparent cell).
+    """
+    spritesheet = np.zeros((sheet_height, sheet_width, 4), dtype=np.uint8)
+    if not placements:
+        return Image.fromarray(spritesheet, 'RGBA')
+
+    # View the destination as (rows, cols) of cells so frames are scattered with one assignment
+    cell_rows = sheet_height // cell_height
+    cell_cols = sheet_width // cell_width
+    cells = spritesheet[:cell_rows * cell_height, :cell_cols * cell_width].reshape(
+        cell_rows, cell_height, cell_cols, cell_width, 4).transpose(0, 2, 1, 3, 4)
+
+    groups = defaultdict(list)
+    for placement in placements:
+        x1, y1, x2, y2 = placement.source_box
+        groups[(placement.sheet_path, x2 - x1, y2 - y1, placement.offset_x, placement.offset_y)].append(placement)
+
+    source_arrays = {}
+    for (sheet_path, frame_width, frame_height, offset_x, offset_y), group in groups.items():
+        source = source_arrays.get(sheet_path)
+        if source is None:
+            source = np.asarray(sprite_sheet_cache.get(sheet_path))
+            source_arrays[sheet_path] = source
+
+        # Clip the frame to the cell, same as Image.paste does
+        dst_x0 = max(offset_x, 0)
+        dst_y0 = max(offset_y, 0)
+        dst_x1 = min(offset_x + frame_width, cell_width)
+        dst_y1 = min(offset_y + frame_height, cell_height)
+        if dst_x0 >= dst_x1 or dst_y0 >= dst_y1:
+            continue
+        src_x0, src_y0 = dst_x0 - offset_x, dst_y0 - offset_y
+        src_x1, src_y1 = dst_x1 - offset_x, dst_y1 - offset_y
+
+        # Frames are zero copy views of the source, mirrored with a negative stride
+        frames = []
+        for placement in group:
+            x1, y1, x2, y2 = placement.source_box
+            frame = source[y1:y2, x1:x2]
+            if placement.flip:
+                frame = frame[:, ::-1]
+            frames.append(frame[src_y0:src_y1, src_x0:src_x1])
+        batch = np.stack(frames).astype(np.uint16)
+
+        # Paste with the frame itself as mask: DIV255(value * alpha) on a transparent cell
+        blended = batch * batch[..., 3:4] + 128
+        blended = ((blended >> 8) + blended) >> 8
+
+        row_index = np.fromiter((p.cell_y // cell_height for p in group), dtype=np.intp, count=len(group))
+        col_index = np.fromiter((p.cell_x // cell_width for p in group), dtype=np.intp, count=len(group))
+        cells[row_index, col_index, dst_y0:dst_y1, dst_x0:dst_x1] = blended.astype(np.uint8)
+
+    return Image.fromarray(spritesheet, 'RGBA')
@@ -2,21 +2,26 @@
 # Description: Sprite processing and spritesheet generation
 
 import os
-import shutil
 from pathlib import Path
 from typing import List
-from PIL import Image, ImageOps, ImageDraw
+from PIL import Image, ImageDraw
 from data_models.animation_models import AnimationData
 from config.debug_config import DEBUG_CONFIG
 from utils.image_utils import load_pixel_font
-from utils.offset_calculator import calculate_sprite_offsets
+from utils.offset_calculator import calculate_sprite_offsets, shadow_foot_cache
+from utils.sheet_cache import sprite_sheet_cache
+from utils.png_output import png_writer
+from utils.asset_store import shared_asset_store
 from .draw_utils import draw_debug_text
+from .frame_blitter import FramePlacement, compose_spritesheet, compose_spritesheet_bands, resolve_render_engine, placement_content_box, crop_placements
 from file_handlers.json_generator import generate_body_json
 from collections import defaultdict
 from config.settings import app_settings
 from utils.path_utils import extract_base_variant_name
+from utils.recolor import is_recolor_candidate, find_color_mapping, apply_color_mapping
+from utils.bbox_optimizer import update_json_offsets
 
-def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str = "generated", frames_per_row: int = 32, debug_frames: bool = False, variations_as_subfolders: bool = True):
+def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str = "generated", frames_per_row: int = 32, debug_frames: bool = False, variations_as_subfolders: bool = True, render_engine: str = "pillow", recolor_fast_path: bool = False, crop_to_content: bool = False):
    
     os.makedirs(output_base_dir, exist_ok=True)
     
@@ -26,6 +31,7 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
     frame_mapping_data = {} 
 
     debug_font = load_pixel_font() if debug_frames else None
+    render_engine = resolve_render_engine(render_engine)
     
     pokemon_variants = defaultdict(list)
     
@@ -57,6 +63,7 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
         base_anim_set = base_data['anim_set']
         base_variation_type = base_data.get('variation_type')
         base_variant_name = extract_base_variant_name(base_anim_set.variant_name, base_variation_type)
+        recolor_source = None
         
         for i, data in enumerate(variants_data_sorted):
             anim_set = data['anim_set']
@@ -86,17 +93,29 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
             credit_source_path = os.path.join(anim_set.directory, "credits.txt")
             credit_dest_path = os.path.join(output_dir, "credits.txt")
             if os.path.exists(credit_source_path):
-                shutil.copy2(credit_source_path, credit_dest_path)
-                print(f"✅ Copied credits.txt: {credit_dest_path}")
+                action = shared_asset_store.materialize(credit_source_path, credit_dest_path)
+                print(f"✅ {action.capitalize()} credits.txt: {credit_dest_path}")
             
             if eyes_source_path:
                 eyes_dest_path = os.path.join(output_dir, "eyes.png")
                 try:
-                    shutil.copy2(eyes_source_path, eyes_dest_path)
-                    print(f"✅ Copied eyes.png: {eyes_dest_path}")
+                    action = shared_asset_store.materialize(eyes_source_path, eyes_dest_path)
+                    print(f"✅ {action.capitalize()} eyes.png: {eyes_dest_path}")
                 except Exception as e:
                     print(f"⚠️ Error copying eyes.png to {eyes_dest_path}: {e}")
             
+            if recolor_fast_path and recolor_source and not debug_frames:
+                spritesheet_data = render_recolor_variant(anim_set, recolor_source, output_dir, variation_type)
+                if spritesheet_data:
+                    frame_mapping_data[anim_set.variant_name] = recolor_source['frame_mapping']
+                    spritesheet_mapping[anim_set.variant_name] = spritesheet_data
+                    try:
+                        generate_body_json(anim_set, spritesheet_data, output_dir)
+                        apply_content_crop(anim_set, spritesheet_data)
+                    except Exception as e:
+                        print(f"⚠️ Failed to generate body.json for {anim_set.variant_name}: {e}")
+                    continue
+            
             offset_x, offset_y, foot_difference = calculate_sprite_offsets(anim_set, anim_set.max_width, anim_set.max_height)
             
             global_offsets = anim_set.global_offsets
@@ -114,37 +133,29 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
             used_frames_per_animation = {}
 
             # First pass: identify frame reuse opportunities
+            # Stardew animations with the same signature produce exactly the same frames
+            reuse_signatures = {}
+            animations_by_name = {}
+            for anim in anim_set.animations:
+                animations_by_name.setdefault(anim.name, anim)
+            
             for stardew_anim in anim_set.stardew_animations:
-                pokemon_anim = next((a for a in anim_set.animations if a.name == stardew_anim.pokemon_anim_name), None)
+                pokemon_anim = animations_by_name.get(stardew_anim.pokemon_anim_name)
                 if not pokemon_anim:
                     continue
-                    
-                # Check if this animation can reuse frames from another Stardew animation
-                can_reuse = False
-                reuse_source_anim = None
                 
-                for existing_anim_name, existing_data in frame_mapping.items():
-                    existing_stardew_anim = next((sa for sa in anim_set.stardew_animations if sa.stardew_anim_name == existing_anim_name), None)
-                    if (existing_stardew_anim and 
-                        existing_stardew_anim.pokemon_anim_name == stardew_anim.pokemon_anim_name and
-                        existing_stardew_anim.stardew_map.mode == stardew_anim.stardew_map.mode and
-                        existing_stardew_anim.stardew_map.use_front_only == stardew_anim.stardew_map.use_front_only):
-                        
-                        # Check if frame indices match for all directions
-                        directions_match = True
-                        for direction in ['front', 'right', 'back', 'left']:
-                            existing_frames = getattr(existing_stardew_anim, f'pokemon_frames_index_{direction}')
-                            current_frames = getattr(stardew_anim, f'pokemon_frames_index_{direction}')
-                            if existing_frames != current_frames:
-                                directions_match = False
-                                break
-                        
-                        if directions_match:
-                            can_reuse = True
-                            reuse_source_anim = existing_anim_name
-                            break
+                reuse_signature = (
+                    stardew_anim.pokemon_anim_name,
+                    stardew_anim.stardew_map.mode,
+                    stardew_anim.stardew_map.use_front_only,
+                    tuple(stardew_anim.pokemon_frames_index_front),
+                    tuple(stardew_anim.pokemon_frames_index_right),
+                    tuple(stardew_anim.pokemon_frames_index_back),
+                    tuple(stardew_anim.pokemon_frames_index_left)
+                )
+                reuse_source_anim = reuse_signatures.get(reuse_signature)
                 
-                if can_reuse and reuse_source_anim:
+                if reuse_source_anim:
                     # Reuse frames from existing animation
                     frame_mapping[stardew_anim.stardew_anim_name] = {
                         'start_index': frame_mapping[reuse_source_anim]['start_index'],
@@ -195,6 +206,7 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
                         'reuses_frames_from': None
                     }
                     total_frames += anim_frames
+                    reuse_signatures[reuse_signature] = stardew_anim.stardew_anim_name
                     
                     if debug_frames:
                         all_used_frames = (
@@ -221,19 +233,13 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
                         if debug_sprite:
                             debug_filename = f"DEBUG_{anim.anim_path}"
                             debug_path = os.path.join(output_dir, debug_filename)
-                            debug_sprite.save(debug_path, 'PNG')
+                            png_writer.save_async(debug_sprite, debug_path, "rgba")
                             print(f"✅ Generated debug spritesheet: {debug_path}")
                 
-            rows_needed = (total_frames + frames_per_row - 1) // frames_per_row
-            spritesheet_width = anim_set.max_width * frames_per_row
-            spritesheet_height = anim_set.max_height * rows_needed
-            
-            spritesheet = Image.new('RGBA', (spritesheet_width, spritesheet_height), (0, 0, 0, 0))
-            
             variant_frame_mapping = {}
-            current_frame_index = 0
-            processed_animations = set()  # Track animations we've processed
-        
+            frame_placements = []
+            # Frames cut from the same source frame with the same flip share one cell: (sheet path, source box, flip) -> cell
+            cell_of_source = {}
 
             for stardew_anim in anim_set.stardew_animations:
                 if stardew_anim.stardew_anim_name not in frame_mapping:
@@ -245,6 +251,10 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
                 if anim_data.get('reuses_frames_from'):
                     print(f"⏭️ Skipping frame copy for {stardew_anim.stardew_anim_name} (reuses {anim_data['reuses_frames_from']})")
                     continue
+                
+                # Spritesheet cell of every frame of the animation, front, right, back then left (None if not drawn)
+                anim_cells = []
+                anim_data['cells'] = anim_cells
                     
                 pokemon_anim = next((a for a in anim_set.animations if a.name == stardew_anim.pokemon_anim_name), None)
                 if not pokemon_anim:
@@ -256,12 +266,13 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
                     continue
                     
                 try:
-                    pokemon_sprite = Image.open(pokemon_sprite_path).convert('RGBA')
+                    pokemon_sprite = sprite_sheet_cache.get(pokemon_sprite_path)
                 except Exception as e:
                     print(f"⚠️ Failed to load {pokemon_sprite_path}: {e}")
                     continue
                 
-                anim_color = stardew_anim.stardew_map.debug_font_color
+                offset_x_center = (anim_set.max_width - pokemon_anim.frame_width) // 2
+                offset_y_center = ((anim_set.max_height - pokemon_anim.frame_height) // 2) + foot_difference
                 
                 directions = [
                     ('front', stardew_anim.pokemon_frames_index_front, False),
@@ -283,44 +294,79 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
                         
                         if (x2 > pokemon_sprite.width or y2 > pokemon_sprite.height):
                             print(f"⚠️ Frame {pokemon_frame_index} out of bounds in {pokemon_sprite_path}: ({x1},{y1})-({x2},{y2}) vs sprite size {pokemon_sprite.size}")
+                            anim_cells.append(None)
                             continue
                         
-                        try:
-                            frame = pokemon_sprite.crop((x1, y1, x2, y2))
-                            
-                            if should_flip:
-                                frame = ImageOps.mirror(frame)
-                            
-                            output_col = current_frame_index % frames_per_row
-                            output_row = current_frame_index // frames_per_row
-                            
-                            output_x = output_col * anim_set.max_width
-                            output_y = output_row * anim_set.max_height
-                            
-                            final_frame = Image.new('RGBA', (anim_set.max_width, anim_set.max_height), (0, 0, 0, 0))
+                        source_key = (pokemon_sprite_path, (x1, y1, x2, y2), should_flip)
+                        cell_index = cell_of_source.get(source_key)
+                        if cell_index is None:
+                            cell_index = len(cell_of_source)
+                            cell_of_source[source_key] = cell_index
                             
-                            offset_x_center = (anim_set.max_width - pokemon_anim.frame_width) // 2
-                            offset_y_center = ((anim_set.max_height - pokemon_anim.frame_height) // 2) + foot_difference
+                            output_col = cell_index % frames_per_row
+                            output_row = cell_index // frames_per_row
                             
-                            final_frame.paste(frame, (offset_x_center, offset_y_center), frame)
+                            frame_placements.append(FramePlacement(
+                                sheet_path=pokemon_sprite_path,
+                                source_box=(x1, y1, x2, y2),
+                                flip=should_flip,
+                                cell_x=output_col * anim_set.max_width,
+                                cell_y=output_row * anim_set.max_height,
+                                offset_x=offset_x_center,
+                                offset_y=offset_y_center
+                            ))
                             
-                            spritesheet.paste(final_frame, (output_x, output_y))
-                            
-                            variant_frame_mapping[current_frame_index] = pokemon_frame_index
-
-                            current_frame_index += 1
-                            
-                        except Exception as e:
-                            print(f"⚠️ Error processing frame {pokemon_frame_index} for {anim_set.variant_name}: {e}")
-                            continue
-                    
+                            variant_frame_mapping[cell_index] = pokemon_frame_index
+                        
+                        anim_cells.append(cell_index)
+            
+            for anim_data in frame_mapping.values():
+                if anim_data.get('reuses_frames_from'):
+                    anim_data['cells'] = frame_mapping[anim_data['reuses_frames_from']].get('cells')
+            
+            planned_frames = sum(cell is not None for anim_data in frame_mapping.values()
+                                 if not anim_data.get('reuses_frames_from') for cell in anim_data.get('cells', ()))
+            shared_frames = planned_frames - len(cell_of_source)
+            if shared_frames:
+                print(f"🧩 {shared_frames} frames share the cell of an identical source frame")
+            total_frames = len(cell_of_source)
+            
+            rows_needed = (total_frames + frames_per_row - 1) // frames_per_row
+            spritesheet_width = anim_set.max_width * frames_per_row
+            spritesheet_height = anim_set.max_height * rows_needed
+            
             frame_mapping_data[anim_set.variant_name] = variant_frame_mapping
             output_path = os.path.join(output_dir, "body.png")
-            spritesheet.save(output_path, 'PNG')
+            
+            cell_width = anim_set.max_width
+            cell_height = anim_set.max_height
+            content_box = placement_content_box(frame_placements, cell_width, cell_height) if crop_to_content else None
+            if content_box:
+                # Render straight into cells cropped to the drawn pixels instead of cropping body.png afterwards
+                frame_placements = crop_placements(frame_placements, content_box, cell_width, cell_height)
+                cell_width = content_box[2] - content_box[0]
+                cell_height = content_box[3] - content_box[1]
+                spritesheet_width = cell_width * frames_per_row
+                spritesheet_height = cell_height * rows_needed
+                print(f"✂️ Content bounding box {content_box}: rendering {anim_set.max_width}x{anim_set.max_height} frames as {cell_width}x{cell_height}")
+            
+            if png_writer.should_stream(spritesheet_width, spritesheet_height):
+                # Big sheet: compose and write one row of frames at a time
+                spritesheet = None
+                png_writer.save_bands(output_path, spritesheet_width, spritesheet_height, compose_spritesheet_bands(
+                    frame_placements, spritesheet_width, spritesheet_height,
+                    cell_width, cell_height, render_engine
+                ))
+            else:
+                spritesheet = compose_spritesheet(
+                    frame_placements, spritesheet_width, spritesheet_height,
+                    cell_width, cell_height, render_engine
+                )
+                png_writer.save_async(spritesheet, output_path)
             
             # Calculate actual reused frames count
             reused_animations = [anim_name for anim_name, data in frame_mapping.items() if data.get('reuses_frames_from')]
-            original_frame_count = sum(data['frame_count'] for data in frame_mapping.values() if not data.get('reuses_frames_from'))
+            original_frame_count = sum(data['frame_count'] for data in frame_mapping.values())
             optimized_frame_count = total_frames
             
             if variations_as_subfolders:
@@ -336,8 +382,9 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
             
             spritesheet_data = {
                 'directory': output_dir,
-                'max_width': anim_set.max_width,
-                'max_height': anim_set.max_height,
+                'max_width': cell_width,
+                'max_height': cell_height,
+                'content_box': content_box,
                 'frames_per_row': frames_per_row,
                 'total_frames': total_frames,
                 'animation_mapping': frame_mapping,
@@ -347,22 +394,86 @@ def generate_spritesheets(sets_with_variation_data: list, output_base_dir: str =
                 'offset_x': offset_x,
                 'offset_y': offset_y,
                 'global_offsets': global_offsets,
-                'variation_type': variation_type
+                'variation_type': variation_type,
+                'reused_animations': len(reused_animations),
+                'reused_frames': original_frame_count - optimized_frame_count
             }
             
             spritesheet_mapping[anim_set.variant_name] = spritesheet_data
             
+            if recolor_fast_path and recolor_source is None and spritesheet is not None:
+                recolor_source = {
+                    'anim_set': anim_set,
+                    'spritesheet': spritesheet,
+                    'sheet_paths': sorted({os.path.relpath(p.sheet_path, anim_set.directory) for p in frame_placements}),
+                    'spritesheet_data': spritesheet_data,
+                    'frame_mapping': variant_frame_mapping
+                }
+            
             try:
                 generate_body_json(anim_set, spritesheet_data, output_dir)
+                apply_content_crop(anim_set, spritesheet_data)
             except Exception as e:
                 print(f"⚠️ Failed to generate body.json for {anim_set.variant_name}: {e}")
     
     for variant_name, sprite_data in spritesheet_mapping.items():
         sprite_data['frame_mapping'] = frame_mapping_data.get(variant_name, {})
 
+    failed_writes = png_writer.wait()
+    if failed_writes:
+        print(f"⚠️ {failed_writes} spritesheets could not be written")
+    sprite_sheet_cache.print_summary()
+    shared_asset_store.print_summary()
+    shadow_foot_cache.print_summary()
+
     print(f"✅ Generated {len(spritesheet_mapping)} spritesheets and body.json files")
     return spritesheet_mapping
 
+def apply_content_crop(anim_set, spritesheet_data: dict):
+    """Move the body.json offsets of a spritesheet rendered at its content bounding box"""
+    content_box = spritesheet_data.get('content_box')
+    body_model = spritesheet_data.get('body_model')
+    if not content_box or body_model is None:
+        return
+    
+    update_json_offsets(os.path.join(spritesheet_data['directory'], "body.json"), content_box[0], content_box[1],
+                        spritesheet_data['max_width'], spritesheet_data['max_height'],
+                        anim_set.max_width, anim_set.max_height, body_model)
+
+def render_recolor_variant(anim_set, recolor_source: dict, output_dir, variation_type):
+    """
+    Render a variant as a palette remap of an already rendered variant of the same Pokémon.
+    Returns the spritesheet data, or None if the variant is not a pure recolor.
+    """
+    base_set = recolor_source['anim_set']
+    if not is_recolor_candidate(base_set, anim_set):
+        return None
+    
+    color_mapping = find_color_mapping(
+        [os.path.join(base_set.directory, path) for path in recolor_source['sheet_paths']],
+        [os.path.join(anim_set.directory, path) for path in recolor_source['sheet_paths']]
+    )
+    if color_mapping is None:
+        print(f"ℹ️ {anim_set.variant_name} is not a recolor of {base_set.variant_name}, rendering it")
+        return None
+    
+    spritesheet = apply_color_mapping(recolor_source['spritesheet'], color_mapping)
+    if spritesheet is None:
+        return None
+    
+    output_path = os.path.join(output_dir, "body.png")
+    png_writer.save_async(spritesheet, output_path)
+    print(f"🎨 Generated (recolor of {base_set.variant_name}): {output_path} ({len(color_mapping)} colors remapped)")
+    
+    spritesheet_data = {key: value for key, value in recolor_source['spritesheet_data'].items() if key != 'body_model'}
+    spritesheet_data.update({
+        'directory': output_dir,
+        'variation_type': variation_type,
+        'recolor_of': base_set.variant_name,
+        'color_mapping': color_mapping
+    })
+    return spritesheet_data
+
 def create_debug_spritesheet(animation: AnimationData, directory: str, used_frames: List[int]):
     """Create a debug version of the spritesheet with numbered frames"""
     sprite_path = os.path.join(directory, animation.anim_path)
@@ -370,8 +481,7 @@ def create_debug_spritesheet(animation: AnimationData, directory: str, used_fram
         return None
     
     try:
-        from PIL import Image
-        original_sprite = Image.open(sprite_path).convert('RGBA')
+        original_sprite = sprite_sheet_cache.get(sprite_path)
         debug_sprite = original_sprite.copy()
         
         font = load_pixel_font()
@@ -471,7 +581,7 @@ def add_debug_numbers_to_spritesheet(spritesheet_path: str, frame_width: int, fr
                 debug_sheet.paste(frame, frame_box)
                 
             # Save debug version
-            debug_sheet.save(spritesheet_path, 'PNG')
+            png_writer.save(debug_sheet, spritesheet_path)
             print(f"✅ Debug numbers added to: {spritesheet_path}")
             
     except Exception as e:
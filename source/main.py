@@ -12,6 +12,11 @@ from file_handlers.xml_parser import find_animdata_files, parse_animdata_xml, de
 from utils.path_utils import load_pokemon_names, get_variation_type, is_variant_in_csv, get_variant_index_from_path
 from image_processing.sprite_processor import generate_spritesheets, add_debug_numbers_to_spritesheet
 from config.settings import AppSettings, app_settings
+from data_models.body_model import write_body_models, merge_repeated_frames
+from utils.coverage_report import MissingAnimationReport, missing_animation_report
+from utils.png_output import png_writer
+from utils.asset_store import shared_asset_store
+from utils.offset_calculator import shadow_foot_cache
 
 class ProcessingMetrics:
     """Simple metrics tracking for processing"""
@@ -22,6 +27,8 @@ class ProcessingMetrics:
         self.errors_count = 0
         self.warnings_count = 0
         self.files_by_type = {}
+        self.reused_animations = 0
+        self.reused_frames = 0
     
     def record_processing(self, frames_count: int, processing_time: float, file_type: str = "unknown"):
         self.files_processed += 1
@@ -35,6 +42,10 @@ class ProcessingMetrics:
     def record_warning(self):
         self.warnings_count += 1
     
+    def record_frame_reuse(self, reused_animations: int, reused_frames: int):
+        self.reused_animations += reused_animations
+        self.reused_frames += reused_frames
+    
     def print_summary(self):
         print(f"\n📊 Processing Summary:")
         print(f"   Files processed: {self.files_processed}")
@@ -50,6 +61,9 @@ class ProcessingMetrics:
         print(f"   Errors: {self.errors_count}")
         print(f"   Warnings: {self.warnings_count}")
         
+        if self.reused_animations:
+            print(f"   Reused animations: {self.reused_animations} ({self.reused_frames} frames not rendered)")
+        
         if self.files_by_type:
             print(f"   Files by type: {self.files_by_type}")
 
@@ -68,7 +82,7 @@ def time_execution(description: str = ""):
         return wrapper
     return decorator
 
-def process_single_animation_file(xml_path: str, pokemon_map: dict, settings: AppSettings, pokemon_variant_counter: defaultdict, variant_mode: VariantProcessingMode = VariantProcessingMode.ALL_VARIANTS, log_file: str = "stardew_missing.log"):
+def process_single_animation_file(xml_path: str, pokemon_map: dict, settings: AppSettings, pokemon_variant_counter: defaultdict, variant_mode: VariantProcessingMode = VariantProcessingMode.ALL_VARIANTS, missing_report: MissingAnimationReport = None):
     """Process a single animation file with timing and metrics"""
     start_time = time.time()
     
@@ -153,7 +167,7 @@ def process_single_animation_file(xml_path: str, pokemon_map: dict, settings: Ap
 
         # Filter animations for Stardew
         from config.stardew_config import load_stardew_mapping_config
-        global_offsets = anim_set.filter_animations_for_stardew(anim_set.pokemon_id, log_file)
+        global_offsets = anim_set.filter_animations_for_stardew(anim_set.pokemon_id, missing_report)
         anim_set.global_offsets = global_offsets
 
         # Compute max width/height based on mapped Stardew animations
@@ -376,12 +390,32 @@ def main():
         help="Optimize spritesheets by cropping transparent areas (reduces file size)"
     )
 
+    parser.add_argument(
+        "--trim-mode",
+        choices=["global", "per-frame"],
+        default="global",
+        help="How --optimize crops frames: global crops every frame to one shared bounding box, per-frame crops each frame to its own and moves it with its body.json Offset (default: global)"
+    )
+
     parser.add_argument(
         "--deduplicate", 
         action="store_true", 
         help="Remove duplicate frames from spritesheets (reduces file size)"
     )
  
+    parser.add_argument(
+        "--dedup-tolerance",
+        type=int,
+        default=0,
+        help="Maximum difference per color channel for --deduplicate to merge two frames, 0 only merges identical frames (default: 0)"
+    )
+ 
+    parser.add_argument(
+        "--dedup-mirrored",
+        action="store_true",
+        help="With --deduplicate, draw body directions whose frames are horizontal mirrors of other frames with the Fashion Sense Flipped flag instead of storing them"
+    )
+ 
     parser.add_argument(
         "--pot-optimize", 
         action="store_true", 
@@ -394,10 +428,79 @@ def main():
         default=4096,
         help="Maximum texture size for POT optimization (default: 4096)"
     )
+
+    parser.add_argument(
+        "--render-engine",
+        choices=["pillow", "numpy"],
+        default="pillow",
+        help="Engine used to compose spritesheets, numpy batches the frame copies and requires NumPy (default: pillow)"
+    )
+
+    parser.add_argument(
+        "--png-profile",
+        choices=["rgba", "palette"],
+        default="rgba",
+        help="body.png output format, palette writes indexed PNGs with transparency when the sheet fits in 256 colors and falls back to RGBA otherwise (default: rgba)"
+    )
+
+    parser.add_argument(
+        "--encoder-threads",
+        type=int,
+        default=2,
+        help="Background threads encoding body.png files while the next spritesheet is composed, 0 writes them synchronously (default: 2)"
+    )
+
+    parser.add_argument(
+        "--stream-threshold-mb",
+        type=int,
+        default=64,
+        help="RGBA spritesheets bigger than this (in MB, uncompressed) are composed and written one row of frames at a time, 0 disables streaming (default: 64)"
+    )
+
+    parser.add_argument(
+        "--link-shared-assets",
+        action="store_true",
+        help="Hardlink eyes.png and credits.txt into the output folders instead of copying them, where the filesystem allows it"
+    )
+
+    parser.add_argument(
+        "--recolor-fast-path",
+        action="store_true",
+        help="Build shiny/altcolor variants that are pure recolors by remapping the base spritesheet palette, requires NumPy"
+    )
+
+    parser.add_argument(
+        "--merge-frames",
+        action="store_true",
+        help="Merge consecutive body.json entries showing the same frame with the same offset and conditions into one entry with the summed duration"
+    )
+
+    parser.add_argument(
+        "--compact-json",
+        action="store_true",
+        help="Write body.json without indentation or extra whitespace"
+    )
+
+    parser.add_argument(
+        "--shadow-cache",
+        help="JSON file where the shadow foot positions are cached between runs, so each shadow sheet is only analyzed once"
+    )
+
+    parser.add_argument(
+        "--missing-report",
+        default="stardew_missing.json",
+        help="Report of Stardew animations without a Pokémon animation, written as CSV if the path ends with .csv (default: stardew_missing.json)"
+    )
     args = parser.parse_args()
 
     # Create settings from arguments
     settings = AppSettings.from_args(args)
+    png_writer.profile = settings.PNG_PROFILE
+    png_writer.encoder_threads = settings.PNG_ENCODER_THREADS
+    png_writer.stream_min_bytes = settings.PNG_STREAM_MIN_MB * 1024 * 1024
+    shared_asset_store.use_hardlinks = settings.LINK_SHARED_ASSETS
+    if args.shadow_cache:
+        shadow_foot_cache.load(args.shadow_cache)
     
     base_dir = args.base_dir
     if not os.path.isdir(base_dir):
@@ -458,6 +561,8 @@ def main():
     
     all_sets = [data['anim_set'] for data in sets_with_variation_data]
     
+    missing_animation_report.write(args.missing_report)
+    
     # Print processing summary so far
     print("\n📈 Animation Processing Complete:")
     metrics.print_summary()
@@ -472,10 +577,14 @@ def main():
         str(settings.OUTPUT_DIR), 
         settings.FRAMES_PER_ROW, 
         settings.ENABLE_DEBUG_FRAMES,
-        variations_as_subfolders
+        variations_as_subfolders,
+        settings.RENDER_ENGINE,
+        settings.RECOLOR_FAST_PATH,
+        args.optimize
     )
     
     spritesheet_time = time.time() - spritesheet_start
+    shadow_foot_cache.save()
     print(f"⏱️ Spritesheet generation took: {spritesheet_time:.2f}s")
     
     # Update total processing time
@@ -484,6 +593,8 @@ def main():
     # Calculate total frames from spritesheet mapping
     total_frames_from_spritesheets = sum(data['total_frames'] for data in spritesheet_mapping.values())
     metrics.total_frames_generated = total_frames_from_spritesheets
+    for data in spritesheet_mapping.values():
+        metrics.record_frame_reuse(data.get('reused_animations', 0), data.get('reused_frames', 0))
     
     # Final summary
     print(f"\n🎉 Final Results:")
@@ -496,7 +607,7 @@ def main():
     if args.optimize:
         print("\n🔄 Starting spritesheet optimization...")
         from utils.bbox_optimizer import batch_optimize_all_outputs
-        spritesheet_mapping = batch_optimize_all_outputs(str(settings.OUTPUT_DIR), spritesheet_mapping)
+        spritesheet_mapping = batch_optimize_all_outputs(str(settings.OUTPUT_DIR), spritesheet_mapping, settings.TRIM_MODE)
     else:
         print("\nℹ️  Optimization skipped (use --optimize to enable)")
     
@@ -504,7 +615,8 @@ def main():
     if args.deduplicate:
         print("\n🔄 Starting frame deduplication...")
         from utils.frame_deduplicator import batch_deduplicate_frames
-        spritesheet_mapping = batch_deduplicate_frames(str(settings.OUTPUT_DIR), spritesheet_mapping)
+        spritesheet_mapping = batch_deduplicate_frames(str(settings.OUTPUT_DIR), spritesheet_mapping, settings.DEDUP_TOLERANCE,
+                                                       settings.DEDUP_MIRRORED)
     else:
         print("\nℹ️  Frame deduplication skipped (use --deduplicate to enable)")
 
@@ -520,6 +632,21 @@ def main():
     else:
         print("\nℹ️  Power-of-two optimization skipped (use --pot-optimize to enable)")
 
+    # === RECOLOR SYNC STEP ===
+    if args.recolor_fast_path and (args.optimize or args.deduplicate or args.pot_optimize):
+        from utils.recolor import batch_sync_recolor_variants
+        spritesheet_mapping = batch_sync_recolor_variants(spritesheet_mapping)
+
+    # === MERGE REPEATED FRAMES STEP ===
+    if settings.MERGE_FRAMES:
+        merged_entries = merge_repeated_frames(spritesheet_mapping)
+        print(f"\n🧮 Merged {merged_entries} repeated frame entries")
+
+    # === BODY.JSON STEP ===
+    written_body_models = write_body_models(spritesheet_mapping, settings.COMPACT_JSON)
+    if written_body_models:
+        print(f"\n📝 Wrote {written_body_models} body.json files")
+
     # === DEBUG STEP ===
     if args.debug_frames:
         print("\n🔢 Adding debug numbers to spritesheets...")
@@ -540,6 +667,8 @@ def main():
                 print(f"⚠️ Failed to add debug to {variant_name}: {e}")
     else:
         print("\nℹ️ Debug numbers skipped (use --debug-frames to enable)")
+
+    png_writer.print_savings(spritesheet_mapping)
     return all_sets, spritesheet_mapping
 
 if __name__ == "__main__":
@@ -6,10 +6,16 @@ from .path_utils import (
     get_variation_path,
     is_variant_in_csv,
     get_variant_index_from_path,
-    extract_base_variant_name
+    extract_base_variant_name,
+    file_digest
 )
 from .offset_calculator import calculate_sprite_offsets, calculate_foot_difference
 from .metrics import ProcessingMetrics, time_execution
+from .coverage_report import MissingAnimationReport, missing_animation_report
+from .sheet_cache import SpriteSheetCache, sprite_sheet_cache
+from .png_output import PngWriter, png_writer, to_palette_image
+from .asset_store import SharedAssetStore, shared_asset_store
+from .recolor import find_color_mapping, apply_color_mapping, batch_sync_recolor_variants
 from .validators import validate_animation_set, validate_sprite_dimensions, validate_frame_indices, validate_output_directory
 from .batch_processor import AnimationSetBuilder, process_single_animation_file, process_animations_parallel
 from .bbox_optimizer import optimize_sprite_output, batch_optimize_all_outputs
@@ -28,10 +34,23 @@ __all__ = [
     'is_variant_in_csv',
     'get_variant_index_from_path',
     'extract_base_variant_name',
+    'file_digest',
     'calculate_sprite_offsets', 
     'calculate_foot_difference',
     'ProcessingMetrics',
     'time_execution',
+    'MissingAnimationReport',
+    'missing_animation_report',
+    'SpriteSheetCache',
+    'sprite_sheet_cache',
+    'PngWriter',
+    'png_writer',
+    'to_palette_image',
+    'SharedAssetStore',
+    'shared_asset_store',
+    'find_color_mapping',
+    'apply_color_mapping',
+    'batch_sync_recolor_variants',
     'validate_animation_set',
     'validate_sprite_dimensions', 
     'validate_frame_indices',
@@ -0,0 +1,62 @@
+# Author: HeartoLazor
+# Description: Content addressed store for files shared by the generated variants (eyes.png, credits.txt)
+
+import os
+import shutil
+import threading
+from .path_utils import file_digest
+
+class SharedAssetStore:
+    """
+    Materializes shared asset files into output folders.
+    Contents are hashed once per file version (shared file digest cache), destinations already holding the same content are not written,
+    and with hardlinks enabled files are linked instead of copied where the filesystem allows it.
+    """
+    def __init__(self, use_hardlinks: bool = False):
+        self.use_hardlinks = use_hardlinks
+        self.linked = 0
+        self.copied = 0
+        self.unchanged = 0
+        self._lock = threading.Lock()
+
+    def digest(self, path) -> str:
+        """SHA-1 of the file content, from the shared file digest cache"""
+        return file_digest(path)
+
+    def _count(self, action: str) -> str:
+        with self._lock:
+            setattr(self, action, getattr(self, action) + 1)
+        return action
+
+    def materialize(self, source_path, dest_path) -> str:
+        """Make dest_path hold the content of source_path, returns 'unchanged', 'linked' or 'copied'"""
+        source_path = str(source_path)
+        dest_path = str(dest_path)
+
+        if os.path.exists(dest_path):
+            if (os.path.samefile(source_path, dest_path) or
+                    (os.path.getsize(source_path) == os.path.getsize(dest_path) and
+                     self.digest(source_path) == self.digest(dest_path))):
+                return self._count("unchanged")
+
+        if self.use_hardlinks:
+            temp_path = dest_path + ".link"
+            try:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                os.link(source_path, temp_path)
+                os.replace(temp_path, dest_path)
+                return self._count("linked")
+            except OSError:
+                # Different filesystem or no hardlink support, fall back to a copy
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+        shutil.copy2(source_path, dest_path)
+        return self._count("copied")
+
+    def print_summary(self):
+        print(f"📎 Shared assets: {self.linked} linked, {self.copied} copied, {self.unchanged} already up to date")
+
+# Global shared asset store instance
+shared_asset_store = SharedAssetStore()
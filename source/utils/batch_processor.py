@@ -10,6 +10,7 @@ from data_models.animation_models import AnimationSet
 from file_handlers.xml_parser import parse_animdata_xml, determine_pokemon_info_from_path
 from utils.metrics import ProcessingMetrics
 from utils.validators import validate_animation_set
+from utils.coverage_report import MissingAnimationReport
 
 class AnimationSetBuilder:
     def __init__(self):
@@ -49,12 +50,12 @@ class AnimationSetBuilder:
         )
         return self
     
-    def with_stardew_mapping(self, log_file: str = "stardew_missing.log") -> 'AnimationSetBuilder':
+    def with_stardew_mapping(self, missing_report: MissingAnimationReport = None) -> 'AnimationSetBuilder':
         """Apply Stardew mapping"""
         if self._animation_set:
             from config.stardew_config import load_stardew_mapping_config
             global_offsets = self._animation_set.filter_animations_for_stardew(
-                self._animation_set.pokemon_id, log_file
+                self._animation_set.pokemon_id, missing_report
             )
             self._animation_set.global_offsets = global_offsets
         return self
@@ -87,7 +88,7 @@ class AnimationSetBuilder:
         else:
             return f"{pokemon_id} - {pokemon_name}"
 
-def process_single_animation_file(xml_path: str, pokemon_map: dict, log_file: str = "stardew_missing.log") -> Optional[AnimationSet]:
+def process_single_animation_file(xml_path: str, pokemon_map: dict, missing_report: MissingAnimationReport = None) -> Optional[AnimationSet]:
     """Process a single animation file with error handling"""
     start_time = time.time()
     try:
@@ -95,7 +96,7 @@ def process_single_animation_file(xml_path: str, pokemon_map: dict, log_file: st
         anim_set = (builder
                    .set_pokemon_map(pokemon_map)
                    .from_xml_path(xml_path)
-                   .with_stardew_mapping(log_file)
+                   .with_stardew_mapping(missing_report)
                    .calculate_dimensions()
                    .build())
         
@@ -2,318 +2,97 @@
 # Description: Bounding box optimization for spritesheets
 
 import os
-import json
-from typing import Dict, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from PIL import Image
+from data_models.body_model import BodyModel
+from .png_output import FrameGridSheet
 
-# The left and right sides calculation of the offsets is not correct for certain pokemons in the body.json after applying this optimization
-# So while this bug is not fixed, skip affected pokemons
-optimization_skip_hack_list = [
-    "0001", #Bulbasaur
-    "0004", #Charmander
-    "0005", #Charmeleon
-    "0019", #Rattata
-    "0023", #Ekans
-    "0027", #Sandshrew
-    "0038", #Ninetales
-    "0040", #Wigglytuff
-    "0043", #Oddish
-    "0044", #Gloom
-    "0045", #Vileplume
-    "0048", #Venonat
-    "0050", #Digglet
-    "0051", #Dugtrio
-    "0056", #Mankey
-    "0067", #Machoke
-    "0068", #Machamp
-    "0069", #Bellsprout
-    "0071", #Victreebel
-    "0072", #Tentacool
-    "0077", #Ponyta
-    "0081", #Magnemite
-    "0085", #Dodrio
-    "0090", #Shellder
-    "0094", #Gengar
-    "0096", #Drowzee
-    "0097", #Hypno
-    "0098", #Krabby
-    "0099", #Kingler
-    "0103", #Exeggutor
-    "0104", #Cubone
-    "0105", #Marowak
-    "0106", #Hitmonlee
-    "0107", #Hitmonchan
-    "0108", #Lickytung
-    "0110", #Weezing
-    "0114", #Tangela
-    "0116", #Horsea
-    "0117", #Seadra
-    "0122", #Mr. Mime
-    "0124", #Jinx
-    "0127", #Pinsir
-    "0134", #Vaporeon
-    "0135", #Jolteon
-    "0142", #Aerodactil
-    "0144", #Articuno
-    "0145", #Zapdos
-    "0152", #Chikorita
-    "0159", #Croconaw
-    "0161", #Sentret
-    "0162", #Furret
-    "0170", #Chinchou
-    "0187", #Hoppip
-    "0192", #Sunflora
-    "0195", #Quagsire
-    "0196", #Espeon
-    "0204", #Pineco
-    "0209", #Snubull
-    "0210", #Granbull
-    "0214", #Heracross
-    "0218", #Slugma
-    "0223", #Remoraid
-    "0232", #Dophan
-    "0235", #Smeargle
-    "0243", #Raikou
-    "0244", #Entei
-    "0245", #Suicune
-    "0251", #Celebi
-    "0252", #Treecko
-    "0253", #Grovyle
-    "0254", #Sceptile
-    "0259", #Marshtomp
-    "0260", #Swamper
-    "0261", #Poochyena
-    "0262", #Mightyena
-    "0271", #Lombre
-    "0274", #Nuzleaf
-    "0280", #Ralts
-    "0286", #Breloom
-    "0298", #Azurill
-    "0299", #Nosepass
-    "0302", #Sableye
-    "0303", #Mawile
-    "0304", #Aron
-    "0307", #Meditite
-    "0309", #Electrike
-    "0311", #Plusle
-    "0312", #Minum
-    "0313", #Volbeat
-    "0315", #Roselia
-    "0322", #Numel
-    "0323", #Camerupt
-    "0324", #Torkoal
-    "0325", #Spoink
-    "0328", #Trapinch
-    "0329", #Vibrava
-    "0335", #Zangosee
-    "0337", #Lunatone
-    "0342", #Crawdaunt
-    "0343", #Baltoy
-    "0345", #Lileep
-    "0346", #Cradily
-    "0352", #Kecleon
-    "0354", #Banette
-    "0357", #Tropius
-    "0359", #Absol
-    "0372", #Shelgon
-    "0377", #Regirock
-    "0378", #Regice
-    "0379", #Registeel
-    "0383", #Groudon
-    "0385", #Jirachi
-    "0386", #Deoxis
-    "0387", #Turtwig
-    "0388", #Grotle
-    "0391", #Monferno
-    "0398", #Staraptor
-    "0400", #Birabel
-    "0403", #Shinx
-    "0404", #Luxio
-    "0405", #Luxray
-    "0407", #Roserade
-    "0417", #Pachirisu
-    "0422", #Gastrodon
-    "0425", #Drifloon
-    "0427", #Buneary
-    "0433", #Chingling
-    "0434", #Stunky
-    "0435", #Skuntank
-    "0442", #Spiritomb
-    "0445", #Garchomp
-    "0446", #Munchlax
-    "0448", #Lucario
-    "0452", #Magnezone
-    "0473", #Mamoswine
-    "0474", #Porygon-Z
-    "0475", #Gallade
-    "0479", #Rotom
-    "0492", #Shaymin
-    "0495", #Snivy
-    "0496", #Servine
-    "0503", #Samurott
-    "0508", #Stoutland
-    "0517", #Munna
-    "0518", #Musharna
-    "0520", #Unfezant
-    "0521", #Roggenrola
-    "0522", #Boldore
-    "0531", #Audino
-    "0532", #Timburr
-    "0533", #Gurdurr
-    "0540", #Sewaddle
-    "0543", #Venipede
-    "0544", #Whirlipede
-    "0545", #Scolipede
-    "0549", #Lilligant
-    "0550", #Basculin
-    "0551", #Sandile
-    "0552", #Krokorok
-    "0555", #Darmanitan
-    "0556", #Maractus
-    "0559", #Scraggy
-    "0560", #Scrafty
-    "0561", #Sigilyph
-    "0567", #Archeops
-    "0568", #Trubbish
-    "0571", #Zoroark
-    "0576", #Gothitelle
-    "0578", #Duosion
-    "0584", #Vanilluxe
-    "0585", #Deerling
-    "0587", #Emolga
-    "0590", #Foongus
-    "0602", #Tynamo
-    "0607", #Litwick
-    "0602", #Fraxure
-    "0602", #Cubchoo
-    "0622", #Golett
-    "0625", #Bisharp
-    "0628", #Braviary
-    "0629", #Vullaby
-    "0631", #Heatmor
-    "0632", #Durant
-    "0640", #Virizion
-    "0643", #Reshiram
-    "0644", #Zekrom
-    "0645", #Landorus
-    "0646", #Kyurem
-    "0647", #Keldeo
-    "0651", #Quilladin
-    "0655", #Delphox
-    "0657", #Frogadier
-    "0664", #Scatterbug
-    "0667", #Litleo
-    "0671", #Florges
-    "0672", #Skiddo
-    "0676", #Furfrou
-    "0678", #Meowstic
-    "0686", #Inkay
-    "0688", #Binacle
-    "0689", #Barbaracle
-    "0691", #Dragalge
-    "0698", #Amaura
-    "0699", #Aurorus
-    "0700", #Sylveon
-    "0701", #Hawlucha
-    "0702", #Dedenne
-    "0704", #Goomy
-    "0705", #Slygoo
-    "0706", #Goodra
-    "0709", #Trevenant
-    "0712", #Bergmite
-    "0713", #Noibat
-    "0714", #Noiverm
-    "0717", #Yvetal
-    "0724", #Decidueye
-    "0727", #Incineroar
-    "0728", #Popplio
-    "0729", #Brionne
-    "0733", #Toucannon
-    "0737", #Charjabug
-    "0739", #Crabrawler
-    "0744", #Rockruff
-    "0747", #Mareanie
-    "0748", #Mudbray
-    "0766", #Passimian
-    "0768", #Golisopod
-    "0769", #Sandygast
-    "0778", #Mimikyu
-    "0780", #Drampa
-    "0783", #Hakamo o
-    "0784", #Kommo o
-    "0785", #Tapu koko
-    "0791", #Solgaleo
-    "0794", #Buzzwole
-    "0795", #Pheromosa
-    "0796", #Xurkitree
-    "0799", #Guzzlord
-    "0801", #Magearna
-    "0806", #Blacephalon
-    "0807", #Zeraora
-    "0811", #Thwackey
-    "0812", #Rillaboom
-    "0813", #Scorbunny
-    "0816", #Sobble
-    "0828", #Thievul
-    "0830", #Eldegoss
-    "0833", #Chewtle
-    "0834", #Drednaw
-    "0841", #Flapple
-    "0843", #Silicobra
-    "0844", #Sandaconda
-    "0851", #Centiskorch
-    "0852", #Clobbopus
-    "0858", #Hatterene
-    "0861", #Grimmsnarl
-    "0862", #Obstagoon
-    "0863", #Cursola
-    "0869", #Alcremie
-    "0875", #Escue
-    "0876", #Indeedee
-    "0877", #Morpeko
-    "0879", #Copperajah
-    "0880", #Dracozolt
-    "0882", #Dracovish
-    "0883", #Arctovish
-    "0884", #Duraludon
-    "0887", #Dragapult
-    "0888", #Zacian
-    "0894", #Regieleki
-    "0901", #Ursaluna
-    "0911", #Skeledirge
-    "0919", #Nymble
-    "0920", #Lokix
-    "0921", #Pawmi
-    "0922", #Pawmot
-    "0939", #Bellibolt
-    "0957", #Tinkatink
-    "0959", #Tinkaton
-    "0960", #Wiglett
-    "0961", #Wugtrio
-    "0963", #Finizen
-    "0964", #Palafin
-    "0968", #Orthworm
-    "0971", #Greavard
-    "0972", #Houndstone
-    "0974", #Cetoddle
-    "0975", #Cetitan
-    "0980", #Clodsire
-    "0981", #Farigiraf
-    "0982", #Dudunsparse
-    "0983", #Kingambit
-    "0985", #Scream Tail
-    "0989", #Sandy Shocks
-    "0991", #Iron Bundle
-    "0998", #Ting Lu
-    "1004", #Chi Yu
-    "1008", #Miraidon
-    "1009", #Walking Wake
-    "1011", #Dipplin
-    "1015", #Munkidori
-    "1016", #Fezandipiti
-    "1020", #Gougin Fire
-    "1024", #Terapagos
-]
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def _alpha_frame_grid(spritesheet: Image.Image, frame_width: int, frame_height: int, total_frames: int, frames_per_row: int):
+    """
+    Alpha channel of the frame grid as a (rows, frame_height, columns, frame_width) array,
+    or None without NumPy or if the spritesheet doesn't hold the whole grid
+    """
+    rows_needed = (total_frames + frames_per_row - 1) // frames_per_row
+    columns = min(frames_per_row, total_frames)
+    if np is None or spritesheet.width < columns * frame_width or spritesheet.height < rows_needed * frame_height:
+        return None
+    
+    alpha = np.asarray(spritesheet.getchannel('A'))[:rows_needed * frame_height, :columns * frame_width]
+    return alpha.reshape(rows_needed, frame_height, columns, frame_width)
+
+def _visible_columns(alpha_grid, total_frames: int):
+    """Visible columns of every frame (frames, frame_width)"""
+    rows_needed, frame_height, columns, frame_width = alpha_grid.shape
+    column_alpha = alpha_grid.reshape(rows_needed, frame_height, columns * frame_width).max(axis=1)
+    return column_alpha.reshape(rows_needed * columns, frame_width)[:total_frames] > 0
+
+def _visible_rows(alpha_grid, total_frames: int):
+    """Visible rows of every frame (frames, frame_height)"""
+    rows_needed, frame_height, columns, frame_width = alpha_grid.shape
+    row_alpha = alpha_grid.max(axis=3).transpose(0, 2, 1)
+    return row_alpha.reshape(rows_needed * columns, frame_height)[:total_frames] > 0
+
+def _visible_union_rows(alpha_grid, total_frames: int):
+    """Rows visible in any frame (frame_height), folding whole rows of frames first"""
+    rows_needed, frame_height, columns, frame_width = alpha_grid.shape
+    full_rows, remaining_frames = divmod(total_frames, columns)
+    row_alpha = np.zeros((frame_height, columns * frame_width), dtype=alpha_grid.dtype)
+    if full_rows:
+        row_alpha = alpha_grid[:full_rows].reshape(full_rows, frame_height, columns * frame_width).max(axis=0)
+    if remaining_frames:
+        last_row = alpha_grid[full_rows, :, :remaining_frames].reshape(frame_height, remaining_frames * frame_width)
+        row_alpha[:, :remaining_frames * frame_width] = np.maximum(row_alpha[:, :remaining_frames * frame_width], last_row)
+    return row_alpha.max(axis=1) > 0
+
+def _line_bounds(visible_lines):
+    """First and last+1 visible index of every line set, and whether anything is visible"""
+    has_visible = visible_lines.any(axis=-1)
+    first = visible_lines.argmax(axis=-1)
+    end = visible_lines.shape[-1] - visible_lines[..., ::-1].argmax(axis=-1)
+    return first, end, has_visible
+
+def _global_bounding_box(spritesheet: Image.Image, frame_width: int, frame_height: int, total_frames: int, frames_per_row: int,
+                         alpha_grid=None) -> Tuple[int, int, int, int]:
+    min_x = frame_width
+    min_y = frame_height
+    max_x = 0
+    max_y = 0
+    
+    if alpha_grid is not None:
+        # Union of all the frames reduced over the frame axes of the alpha view
+        first_x, end_x, has_visible = _line_bounds(_visible_columns(alpha_grid, total_frames).any(axis=0))
+        first_y, end_y, _ = _line_bounds(_visible_union_rows(alpha_grid, total_frames))
+        if has_visible:
+            min_x, min_y, max_x, max_y = int(first_x), int(first_y), int(end_x), int(end_y)
+        return min_x, min_y, max_x, max_y
+    
+    for frame_index in range(total_frames):
+        row = frame_index // frames_per_row
+        col = frame_index % frames_per_row
+        
+        x_start = col * frame_width
+        y_start = row * frame_height
+        x_end = x_start + frame_width
+        y_end = y_start + frame_height
+        
+        frame = spritesheet.crop((x_start, y_start, x_end, y_end))
+        
+        # Get bounding box of non-transparent pixels
+        bbox = frame.getbbox()
+        if bbox:
+            frame_min_x, frame_min_y, frame_max_x, frame_max_y = bbox
+            
+            min_x = min(min_x, frame_min_x)
+            min_y = min(min_y, frame_min_y)
+            max_x = max(max_x, frame_max_x)
+            max_y = max(max_y, frame_max_y)
+    
+    return min_x, min_y, max_x, max_y
 
 def calculate_global_bounding_box(spritesheet_path: str, frame_width: int, frame_height: int, total_frames: int, frames_per_row: int) -> Tuple[int, int, int, int]:
     """Calculate the minimum bounding box that contains all non-transparent pixels from all frames"""
@@ -321,161 +100,328 @@ def calculate_global_bounding_box(spritesheet_path: str, frame_width: int, frame
     
     with Image.open(spritesheet_path) as spritesheet:
         spritesheet = spritesheet.convert('RGBA')
-        
-        min_x = frame_width
-        min_y = frame_height
-        max_x = 0
-        max_y = 0
-        
-        for frame_index in range(total_frames):
-            row = frame_index // frames_per_row
-            col = frame_index % frames_per_row
-            
-            x_start = col * frame_width
-            y_start = row * frame_height
-            x_end = x_start + frame_width
-            y_end = y_start + frame_height
-            
-            frame = spritesheet.crop((x_start, y_start, x_end, y_end))
-            
-            # Get bounding box of non-transparent pixels
-            bbox = frame.getbbox()
-            if bbox:
-                frame_min_x, frame_min_y, frame_max_x, frame_max_y = bbox
-                
-                min_x = min(min_x, frame_min_x)
-                min_y = min(min_y, frame_min_y)
-                max_x = max(max_x, frame_max_x)
-                max_y = max(max_y, frame_max_y)
-        
-        print(f"✅ Bounding box: ({min_x}, {min_y}) to ({max_x}, {max_y})")
-        print(f"📏 Original size: {frame_width}x{frame_height}, Optimized size: {max_x-min_x}x{max_y-min_y}")
-        
-        return min_x, min_y, max_x, max_y
+        alpha_grid = _alpha_frame_grid(spritesheet, frame_width, frame_height, total_frames, frames_per_row)
+        min_x, min_y, max_x, max_y = _global_bounding_box(spritesheet, frame_width, frame_height, total_frames, frames_per_row, alpha_grid)
+    
+    print(f"✅ Bounding box: ({min_x}, {min_y}) to ({max_x}, {max_y})")
+    print(f"📏 Original size: {frame_width}x{frame_height}, Optimized size: {max_x-min_x}x{max_y-min_y}")
+    
+    return min_x, min_y, max_x, max_y
 
 def optimize_spritesheet(spritesheet_path: str, output_path: str, frame_width: int, frame_height: int, 
                         total_frames: int, frames_per_row: int) -> Tuple[int, int, int, int]:
     """Optimize spritesheet by cropping to minimum bounding box"""
-    min_x, min_y, max_x, max_y = calculate_global_bounding_box(
-        spritesheet_path, frame_width, frame_height, total_frames, frames_per_row
-    )
-    
-    optimized_width = max_x - min_x
-    optimized_height = max_y - min_y
-    
-    print(f"✂️ Cropping spritesheet to {optimized_width}x{optimized_height}...")
+    print(f"📐 Calculating global bounding box for {spritesheet_path}...")
     
     with Image.open(spritesheet_path) as spritesheet:
         spritesheet = spritesheet.convert('RGBA')
         
+        # The spritesheet is decoded once for both the bounding box and the re-tiling
+        alpha_grid = _alpha_frame_grid(spritesheet, frame_width, frame_height, total_frames, frames_per_row)
+        min_x, min_y, max_x, max_y = _global_bounding_box(spritesheet, frame_width, frame_height, total_frames, frames_per_row, alpha_grid)
+        
+        print(f"✅ Bounding box: ({min_x}, {min_y}) to ({max_x}, {max_y})")
+        print(f"📏 Original size: {frame_width}x{frame_height}, Optimized size: {max_x-min_x}x{max_y-min_y}")
+        
+        optimized_width = max_x - min_x
+        optimized_height = max_y - min_y
+        
+        print(f"✂️ Cropping spritesheet to {optimized_width}x{optimized_height}...")
+        
         rows_needed = (total_frames + frames_per_row - 1) // frames_per_row
         new_width = optimized_width * frames_per_row
         new_height = optimized_height * rows_needed
         
-        optimized_sheet = Image.new('RGBA', (new_width, new_height), (0, 0, 0, 0))
+        optimized_sheet = FrameGridSheet(output_path, new_width, new_height, optimized_height)
         
-        for frame_index in range(total_frames):
-            row = frame_index // frames_per_row
-            col = frame_index % frames_per_row
-            
-            # Original frame position
-            orig_x_start = col * frame_width
-            orig_y_start = row * frame_height
-            
-            # Cropped region from original
-            crop_box = (orig_x_start + min_x, orig_y_start + min_y, 
-                       orig_x_start + max_x, orig_y_start + max_y)
-            cropped_frame = spritesheet.crop(crop_box)
-            
-            # Position in optimized spritesheet
-            new_x = col * optimized_width
-            new_y = row * optimized_height
-            
-            optimized_sheet.paste(cropped_frame, (new_x, new_y))
+        try:
+            if alpha_grid is not None and optimized_width > 0 and optimized_height > 0:
+                # Crop every frame with one slice of the (rows, frame_height, columns, frame_width) view
+                rows, _, columns, _ = alpha_grid.shape
+                pixels = np.asarray(spritesheet)[:rows * frame_height, :columns * frame_width]
+                cropped = pixels.reshape(rows, frame_height, columns, frame_width, 4)[:, min_y:max_y, :, min_x:max_x]
+                
+                # One band per row of frames, so streamed sheets never hold the whole output in memory
+                for row in range(rows):
+                    band = np.ascontiguousarray(cropped[row]).reshape(optimized_height, -1, 4)
+                    if row == rows - 1:
+                        # Cells after the last frame stay empty
+                        band[:, (total_frames - row * columns) * optimized_width:] = 0
+                    optimized_sheet.paste(Image.fromarray(band, 'RGBA'), (0, row * optimized_height))
+            else:
+                for frame_index in range(total_frames):
+                    row = frame_index // frames_per_row
+                    col = frame_index % frames_per_row
+                
+                    # Original frame position
+                    orig_x_start = col * frame_width
+                    orig_y_start = row * frame_height
+                
+                    # Cropped region from original
+                    crop_box = (orig_x_start + min_x, orig_y_start + min_y, 
+                               orig_x_start + max_x, orig_y_start + max_y)
+                    cropped_frame = spritesheet.crop(crop_box)
+                
+                    # Position in optimized spritesheet
+                    new_x = col * optimized_width
+                    new_y = row * optimized_height
+                
+                    optimized_sheet.paste(cropped_frame, (new_x, new_y))
+        except BaseException:
+            optimized_sheet.abort()
+            raise
         
-        optimized_sheet.save(output_path, 'PNG')
+        optimized_sheet.close()
         print(f"✅ Optimized spritesheet saved: {output_path}")
         
         return optimized_width, optimized_height, min_x, min_y
 
-def update_json_offsets(body_json_path: str, crop_offset_x: int, crop_offset_y: int, 
-                       new_width: int, new_height: int, original_width: int, original_height: int):
-    """Update offsets in body.json after optimization"""
-    print(f"📝 Updating JSON offsets: {body_json_path}...")
+def _frame_bounding_boxes(spritesheet: Image.Image, frame_width: int, frame_height: int, total_frames: int, frames_per_row: int,
+                          alpha_grid=None) -> List[Optional[Tuple[int, int, int, int]]]:
+    if alpha_grid is not None:
+        min_x, max_x, has_visible = _line_bounds(_visible_columns(alpha_grid, total_frames))
+        min_y, max_y, _ = _line_bounds(_visible_rows(alpha_grid, total_frames))
+        return [(int(x0), int(y0), int(x1), int(y1)) if visible else None
+                for x0, y0, x1, y1, visible in zip(min_x, min_y, max_x, max_y, has_visible)]
+    
+    frame_boxes = []
+    for frame_index in range(total_frames):
+        x_start = (frame_index % frames_per_row) * frame_width
+        y_start = (frame_index // frames_per_row) * frame_height
+        frame_boxes.append(spritesheet.crop((x_start, y_start, x_start + frame_width, y_start + frame_height)).getbbox())
+    return frame_boxes
+
+def calculate_frame_bounding_boxes(spritesheet_path: str, frame_width: int, frame_height: int,
+                                   total_frames: int, frames_per_row: int) -> List[Optional[Tuple[int, int, int, int]]]:
+    """Bounding box of the non-transparent pixels of every frame (None for empty frames)"""
+    print(f"📐 Calculating per-frame bounding boxes for {spritesheet_path}...")
     
-    with open(body_json_path, 'r', encoding='utf-8') as f:
-        body_data = json.load(f)
+    with Image.open(spritesheet_path) as spritesheet:
+        spritesheet = spritesheet.convert('RGBA')
+        alpha_grid = _alpha_frame_grid(spritesheet, frame_width, frame_height, total_frames, frames_per_row)
+        return _frame_bounding_boxes(spritesheet, frame_width, frame_height, total_frames, frames_per_row, alpha_grid)
+
+def trim_spritesheet_frames(spritesheet_path: str, output_path: str, frame_width: int, frame_height: int,
+                            total_frames: int, frames_per_row: int) -> Tuple[int, int, List[Optional[Tuple[int, int, int, int]]]]:
+    """
+    Crop every frame to its own bounding box and place it at the top left corner of its cell.
+    Cells are as big as the biggest cropped frame, so poses far apart in the frame don't widen every cell.
+    """
+    print(f"📐 Calculating per-frame bounding boxes for {spritesheet_path}...")
+    
+    with Image.open(spritesheet_path) as spritesheet:
+        spritesheet = spritesheet.convert('RGBA')
+        
+        alpha_grid = _alpha_frame_grid(spritesheet, frame_width, frame_height, total_frames, frames_per_row)
+        frame_boxes = _frame_bounding_boxes(spritesheet, frame_width, frame_height, total_frames, frames_per_row, alpha_grid)
+        
+        visible_boxes = [bbox for bbox in frame_boxes if bbox]
+        cell_width = max((bbox[2] - bbox[0] for bbox in visible_boxes), default=1)
+        cell_height = max((bbox[3] - bbox[1] for bbox in visible_boxes), default=1)
+        
+        print(f"✂️ Trimming frames into {cell_width}x{cell_height} cells...")
+        
+        rows_needed = (total_frames + frames_per_row - 1) // frames_per_row
+        trimmed_sheet = FrameGridSheet(output_path, cell_width * frames_per_row, cell_height * rows_needed, cell_height)
+        
+        try:
+            for frame_index, bbox in enumerate(frame_boxes):
+                if not bbox:
+                    continue
+                row = frame_index // frames_per_row
+                col = frame_index % frames_per_row
+            
+                orig_x_start = col * frame_width
+                orig_y_start = row * frame_height
+                trimmed_frame = spritesheet.crop((orig_x_start + bbox[0], orig_y_start + bbox[1],
+                                                  orig_x_start + bbox[2], orig_y_start + bbox[3]))
+                trimmed_sheet.paste(trimmed_frame, (col * cell_width, row * cell_height))
+        except BaseException:
+            trimmed_sheet.abort()
+            raise
+        
+        trimmed_sheet.close()
+        print(f"✅ Trimmed spritesheet saved: {output_path}")
+    
+    return cell_width, cell_height, frame_boxes
+
+CropBox = Tuple[int, int, int, int]
+
+def _fold_crop_offsets(body_model: BodyModel, crop_box_of: Callable[[int], Optional[CropBox]],
+                       cell_width: int, cell_height: int, original_width: int) -> int:
+    """
+    Move the frames back to their on-screen position after their crop box was moved to the cell top left corner.
+    Flipped bodies are mirrored in game, so their X crop is measured from the right side of the frame.
+    Returns the number of updated frames.
+    """
+    body_data = body_model.data
+    
+    def crop_delta(frame_number: int, flipped: bool) -> Tuple[int, int]:
+        crop_box = crop_box_of(frame_number)
+        if not crop_box:
+            return 0, 0
+        if flipped:
+            return original_width - crop_box[0] - cell_width, crop_box[1]
+        return crop_box[0], crop_box[1]
     
     # Update body dimensions
-    if 'FrontBody' in body_data:
-        body_data['FrontBody']['BodySize'] = {"Width": new_width, "Length": new_height}
-        body_data['FrontBody']['Portrait']['SourceRectangle'] = {'X':0, 'Y':0, "Width": new_width, "Height": new_height}
-        portrait_offset_x = body_data['FrontBody']['Portrait']['Offset']['X']
-        portrait_offset_y = body_data['FrontBody']['Portrait']['Offset']['Y']
-        body_data['FrontBody']['Portrait']['Offset'] = {'X': portrait_offset_x + crop_offset_x, 'Y': portrait_offset_y + crop_offset_y}
-    if 'RightBody' in body_data:
-        body_data['RightBody']['BodySize'] = {"Width": new_width, "Length": new_height}
-    if 'BackBody' in body_data:
-        body_data['BackBody']['BodySize'] = {"Width": new_width, "Length": new_height}
-    if 'LeftBody' in body_data:
-        body_data['LeftBody']['BodySize'] = {"Width": new_width, "Length": new_height}
+    for body_type, body in body_model.body_types():
+        body['BodySize'] = {"Width": cell_width, "Length": cell_height}
+    
+    portrait = body_model.portrait()
+    if 'FrontBody' in body_data and portrait:
+        delta_x, delta_y = crop_delta(0, False)
+        portrait['SourceRectangle'] = {'X':0, 'Y':0, "Width": cell_width, "Height": cell_height}
+        portrait['Offset'] = {'X': portrait['Offset']['X'] + delta_x, 'Y': portrait['Offset']['Y'] + delta_y}
     
     # Update frame offsets in all animations
-    def update_frame_offsets(animations):
+    total_frames_updated = 0
+    for body_type, animation_list, frames in body_model.animation_frames():
+        flipped = bool(body_data[body_type].get('Flipped', False))
         frames_updated = 0
-        for anim in animations:
-            if 'Offset' in anim:
-                anim['Offset']['X'] = anim['Offset']['X'] - crop_offset_x
-                anim['Offset']['Y'] = anim['Offset']['Y'] - crop_offset_y
+        for frame in frames:
+            if 'Offset' in frame:
+                delta_x, delta_y = crop_delta(frame.get('Frame', 0), flipped)
+                frame['Offset']['X'] = frame['Offset']['X'] - delta_x
+                frame['Offset']['Y'] = frame['Offset']['Y'] - delta_y
                 frames_updated += 1
-        return frames_updated
+        total_frames_updated += frames_updated
+        print(f"  📋 Updated {frames_updated} frames in {body_type}.{animation_list}")
     
-    total_frames_updated = 0
+    body_model.mark_modified()
+    return total_frames_updated
+
+def update_json_offsets(body_json_path: str, crop_offset_x: int, crop_offset_y: int, 
+                       new_width: int, new_height: int, original_width: int, original_height: int,
+                       body_model: Optional[BodyModel] = None):
+    """Update offsets in the body model after optimization (loaded from and saved to body.json if not given)"""
+    print(f"📝 Updating JSON offsets: {body_json_path}...")
     
-    for body_type in ['FrontBody', 'RightBody', 'BackBody', 'LeftBody']:
-        if body_type in body_data:
-            # Update IdleAnimation
-            if 'IdleAnimation' in body_data[body_type]:
-                frames_updated = update_frame_offsets(body_data[body_type]['IdleAnimation'])
-                total_frames_updated += frames_updated
-                print(f"  📋 Updated {frames_updated} frames in {body_type}.IdleAnimation")
-            
-            # Update MovementAnimations
-            if 'MovementAnimation' in body_data[body_type]:
-                frames_updated = update_frame_offsets(body_data[body_type]['MovementAnimation'])
-                total_frames_updated += frames_updated
-                print(f"  📋 Updated {frames_updated} frames in {body_type}.MovementAnimation")
+    save_to_file = body_model is None
+    if save_to_file:
+        body_model = BodyModel.load(body_json_path)
+    
+    crop_box = (crop_offset_x, crop_offset_y, crop_offset_x + new_width, crop_offset_y + new_height)
+    total_frames_updated = _fold_crop_offsets(body_model, lambda frame_number: crop_box, new_width, new_height, original_width)
     
-    # Save updated JSON
-    with open(body_json_path, 'w', encoding='utf-8') as f:
-        json.dump(body_data, f, indent=2)
+    if save_to_file:
+        body_model.write(body_json_path)
     
     print(f"✅ Updated JSON: {total_frames_updated} frame offsets, body dimensions, and portrait")
 
+def update_json_trim_offsets(body_json_path: str, frame_boxes: List[Optional[CropBox]],
+                             cell_width: int, cell_height: int, original_width: int,
+                             body_model: Optional[BodyModel] = None):
+    """Fold the trim of each frame into the Offset of the body.json frames that show it"""
+    print(f"📝 Updating JSON per-frame offsets: {body_json_path}...")
+    
+    save_to_file = body_model is None
+    if save_to_file:
+        body_model = BodyModel.load(body_json_path)
+    
+    def frame_box(frame_number: int) -> Optional[CropBox]:
+        return frame_boxes[frame_number] if 0 <= frame_number < len(frame_boxes) else None
+    
+    total_frames_updated = _fold_crop_offsets(body_model, frame_box, cell_width, cell_height, original_width)
+    
+    if save_to_file:
+        body_model.write(body_json_path)
+    
+    print(f"✅ Updated JSON: {total_frames_updated} per-frame offsets, body dimensions, and portrait")
+
+def _frame_offsets(body_model: BodyModel) -> Dict[Tuple[str, str, int], Tuple[int, int]]:
+    """Offset of every body.json frame, keyed by (body type, animation list, position)"""
+    return {(body_type, animation_list, position): (frame['Offset']['X'], frame['Offset']['Y'])
+            for body_type, animation_list, frames in body_model.animation_frames()
+            for position, frame in enumerate(frames) if 'Offset' in frame}
+
+def _screen_box(box: CropBox, offset: Tuple[int, int], cell_width: int, flipped: bool) -> CropBox:
+    """Screen position and size of the visible pixels of a frame drawn with this Offset, flipped cells are mirrored"""
+    left = cell_width - box[2] if flipped else box[0]
+    return left - offset[0], box[1] - offset[1], box[2] - box[0], box[3] - box[1]
+
+def verify_crop_anchors(body_model: BodyModel, offsets_before: Dict[Tuple[str, str, int], Tuple[int, int]],
+                        boxes_before: List[Optional[CropBox]], cell_width_before: int,
+                        boxes_after: List[Optional[CropBox]], cell_width_after: int) -> int:
+    """
+    Check that every frame shows its visible pixels at the same screen position before and after cropping.
+    The boxes are the visible pixel bounding boxes read from the spritesheets before and after the crop,
+    so a wrong offset fold is caught. Returns the number of moved frames.
+    """
+    body_data = body_model.data
+    moved = []
+    
+    for body_type, animation_list, frames in body_model.animation_frames():
+        flipped = bool(body_data[body_type].get('Flipped', False))
+        for position, frame in enumerate(frames):
+            key = (body_type, animation_list, position)
+            frame_number = frame.get('Frame', 0)
+            if key not in offsets_before or 'Offset' not in frame:
+                continue
+            
+            box_before = boxes_before[frame_number] if 0 <= frame_number < len(boxes_before) else None
+            box_after = boxes_after[frame_number] if 0 <= frame_number < len(boxes_after) else None
+            screen_before = box_before and _screen_box(box_before, offsets_before[key], cell_width_before, flipped)
+            screen_after = box_after and _screen_box(box_after, (frame['Offset']['X'], frame['Offset']['Y']),
+                                                     cell_width_after, flipped)
+            if screen_before != screen_after:
+                moved.append((key, screen_before, screen_after))
+    
+    if moved:
+        print(f"❌ {len(moved)} frames moved on screen after cropping:")
+        for (body_type, animation_list, position), screen_before, screen_after in moved[:5]:
+            print(f"  📋 {body_type}.{animation_list}[{position}]: {screen_before} → {screen_after}")
+    else:
+        print(f"✅ Verified on-screen position of {len(offsets_before)} frames")
+    return len(moved)
+
 def optimize_sprite_output(output_dir: str, original_width: int, original_height: int, 
-                          total_frames: int, frames_per_row: int = 32):
-    """Main optimization function for a sprite output directory"""
+                          total_frames: int, frames_per_row: int = 32, body_model: Optional[BodyModel] = None,
+                          trim_mode: str = "global"):
+    """Main optimization function for a sprite output directory, trim_mode is global or per-frame"""
     print(f"🎯 Optimizing sprite output: {output_dir}")
     
     spritesheet_path = os.path.join(output_dir, "body.png")
     body_json_path = os.path.join(output_dir, "body.json")
     
-    if not os.path.exists(spritesheet_path) or not os.path.exists(body_json_path):
+    if not os.path.exists(spritesheet_path) or (body_model is None and not os.path.exists(body_json_path)):
         print(f"⚠️ Skipping optimization: required files not found in {output_dir}")
         return
         
-    # Optimize spritesheet
-    temp_spritesheet = os.path.join(output_dir, "body_optimized.png")
-    new_width, new_height, crop_x, crop_y = optimize_spritesheet(
-        spritesheet_path, temp_spritesheet, original_width, original_height, 
-        total_frames, frames_per_row
-    )
+    save_to_file = body_model is None
+    if save_to_file:
+        body_model = BodyModel.load(body_json_path)
+    offsets_before = _frame_offsets(body_model)
     
-    # Replace original with optimized
-    os.replace(temp_spritesheet, spritesheet_path)
+    temp_spritesheet = os.path.join(output_dir, "body_optimized.png")
+    if trim_mode == "per-frame":
+        new_width, new_height, frame_boxes = trim_spritesheet_frames(
+            spritesheet_path, temp_spritesheet, original_width, original_height,
+            total_frames, frames_per_row
+        )
+        os.replace(temp_spritesheet, spritesheet_path)
+        update_json_trim_offsets(body_json_path, frame_boxes, new_width, new_height, original_width, body_model)
+        boxes_before = frame_boxes
+    else:
+        boxes_before = calculate_frame_bounding_boxes(spritesheet_path, original_width, original_height,
+                                                      total_frames, frames_per_row)
+        
+        # Optimize spritesheet
+        new_width, new_height, crop_x, crop_y = optimize_spritesheet(
+            spritesheet_path, temp_spritesheet, original_width, original_height, 
+            total_frames, frames_per_row
+        )
+        
+        # Replace original with optimized
+        os.replace(temp_spritesheet, spritesheet_path)
+        
+        # Update JSON
+        update_json_offsets(body_json_path, crop_x, crop_y, new_width, new_height, original_width, original_height, body_model)
     
-    # Update JSON
-    update_json_offsets(body_json_path, crop_x, crop_y, new_width, new_height, original_width, original_height)
+    boxes_after = calculate_frame_bounding_boxes(spritesheet_path, new_width, new_height, total_frames, frames_per_row)
+    verify_crop_anchors(body_model, offsets_before, boxes_before, original_width, boxes_after, new_width)
+    if save_to_file:
+        body_model.write(body_json_path)
     
     print(f"🎉 Optimization complete for {output_dir}")
     print(f"📊 Size reduction: {original_width}x{original_height} → {new_width}x{new_height}")
@@ -483,34 +429,39 @@ def optimize_sprite_output(output_dir: str, original_width: int, original_height
 
     return new_width, new_height
 
-def batch_optimize_all_outputs(base_output_dir: str, spritesheet_mapping: Dict) -> Dict:
+def batch_optimize_all_outputs(base_output_dir: str, spritesheet_mapping: Dict, trim_mode: str = "global") -> Dict:
     """Optimize all generated spritesheets in batch and return updated mapping"""
     print(f"🚀 Starting batch optimization for {len(spritesheet_mapping)} spritesheets...")
     
     updated_mapping = spritesheet_mapping.copy()
     
     for variant_name, sprite_data in spritesheet_mapping.items():
-        pokemon_id: str = sprite_data['pokemon_id']
-        if(pokemon_id not in optimization_skip_hack_list):
-            output_dir = sprite_data['directory']
-            original_width = sprite_data['max_width']
-            original_height = sprite_data['max_height']
-            total_frames = sprite_data['total_frames']
-            frames_per_row = sprite_data.get('frames_per_row', 32)
+        if sprite_data.get('recolor_of'):
+            print(f"🎨 Skipping optimization for {variant_name}: recolor of {sprite_data['recolor_of']}, synced afterwards")
+            continue
+        
+        if sprite_data.get('content_box') and trim_mode != "per-frame":
+            print(f"✂️ Skipping optimization for {variant_name}: already rendered at its content bounding box")
+            continue
+        
+        output_dir = sprite_data['directory']
+        original_width = sprite_data['max_width']
+        original_height = sprite_data['max_height']
+        total_frames = sprite_data['total_frames']
+        frames_per_row = sprite_data.get('frames_per_row', 32)
+        
+        print(f"\n--- Optimizing {variant_name} ---")
+        try:
+            new_width, new_height = optimize_sprite_output(output_dir, original_width, original_height, total_frames, frames_per_row,
+                                                           sprite_data.get('body_model'), trim_mode)
             
-            print(f"\n--- Optimizing {variant_name} ---")
-            try:
-                new_width, new_height = optimize_sprite_output(output_dir, original_width, original_height, total_frames, frames_per_row)
+            if new_width and new_height:
+                updated_mapping[variant_name]['max_width'] = new_width
+                updated_mapping[variant_name]['max_height'] = new_height
+                print(f"📐 Updated dimensions: {original_width}x{original_height} → {new_width}x{new_height}")
                 
-                if new_width and new_height:
-                    updated_mapping[variant_name]['max_width'] = new_width
-                    updated_mapping[variant_name]['max_height'] = new_height
-                    print(f"📐 Updated dimensions: {original_width}x{original_height} → {new_width}x{new_height}")
-                    
-            except Exception as e:
-                print(f"❌ Failed to optimize {variant_name}: {e}")
-        else:
-            print(f"⚠️ Skipping optimization: Optimization disabled for {variant_name} while the left and right sides calculation of the offsets is not correct in the body.json for certain pokemons after applying this optimization")
-    
+        except Exception as e:
+            print(f"❌ Failed to optimize {variant_name}: {e}")
+
     print(f"\n🎊 Batch optimization completed!")
     return updated_mapping
\ No newline at end of file
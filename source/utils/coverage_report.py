@@ -0,0 +1,89 @@
+# Author: HeartoLazor
+# Description: Aggregated Stardew animation coverage report
+
+import os
+import csv
+import json
+import threading
+from typing import Dict, List, Union
+
+class MissingAnimationReport:
+    """Thread-safe collector of missing Stardew animations per variant, flushed once per run"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.variants: Dict[str, Dict] = {}
+
+    def record_variant(self, variant_name: str, mapped_count: int, missing: List[tuple]):
+        """Record the coverage of one variant, missing is a list of (stardew_anim_name, fallback_names)"""
+        entry = {
+            'mapped': mapped_count,
+            'total': mapped_count + len(missing),
+            'missing': [
+                {'stardew_animation': stardew_anim_name, 'fallback_names': list(fallbacks)}
+                for stardew_anim_name, fallbacks in missing
+            ]
+        }
+        with self._lock:
+            self.variants[variant_name] = entry
+
+    def merge(self, other: Union['MissingAnimationReport', Dict]):
+        """Merge another report (or its to_dict() output) coming from a worker"""
+        other_variants = other.to_dict()['variants'] if isinstance(other, MissingAnimationReport) else other.get('variants', {})
+        with self._lock:
+            self.variants.update(other_variants)
+        return self
+
+    def clear(self):
+        with self._lock:
+            self.variants.clear()
+
+    def missing_by_animation(self) -> Dict[str, int]:
+        counts = {}
+        with self._lock:
+            for entry in self.variants.values():
+                for missing in entry['missing']:
+                    name = missing['stardew_animation']
+                    counts[name] = counts.get(name, 0) + 1
+        return dict(sorted(counts.items()))
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            variants = {name: self.variants[name] for name in sorted(self.variants)}
+        return {
+            'variants_total': len(variants),
+            'variants_with_missing': sum(1 for entry in variants.values() if entry['missing']),
+            'missing_by_animation': self.missing_by_animation(),
+            'variants': variants
+        }
+
+    def write(self, report_path: str):
+        """Write the report as CSV if the path ends with .csv, otherwise as JSON"""
+        report_dir = os.path.dirname(report_path)
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+
+        data = self.to_dict()
+        if str(report_path).lower().endswith('.csv'):
+            with open(report_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['variant', 'mapped', 'total', 'stardew_animation', 'fallback_names'])
+                for variant_name, entry in data['variants'].items():
+                    for missing in entry['missing']:
+                        writer.writerow([variant_name, entry['mapped'], entry['total'],
+                                         missing['stardew_animation'], ";".join(missing['fallback_names'])])
+        else:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+
+        print(f"📝 Missing animation report: {data['variants_with_missing']}/{data['variants_total']} variants with missing animations → {report_path}")
+
+    def __getstate__(self):
+        # Locks can't be pickled, workers send only the collected data
+        return {'variants': self.to_dict()['variants']}
+
+    def __setstate__(self, state):
+        self._lock = threading.Lock()
+        self.variants = dict(state.get('variants', {}))
+
+# Global report instance
+missing_animation_report = MissingAnimationReport()
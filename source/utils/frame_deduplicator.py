@@ -2,9 +2,20 @@
 # Description: Frame deduplication and optimization
 
 import os
-import json
-from PIL import Image
-from typing import Dict, List, Tuple
+import hashlib
+from collections import defaultdict
+from PIL import Image, ImageOps
+from data_models.body_model import BodyModel
+from .png_output import FrameGridSheet
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Frames are summarized by the mean of each channel over a grid of blocks of this size
+SIGNATURE_GRID = 4
 
 def compare_frames_pixel_by_pixel(frame1: Image.Image, frame2: Image.Image, tolerance: int = 0) -> bool:
     """
@@ -36,28 +47,14 @@ def compare_frames_pixel_by_pixel(frame1: Image.Image, frame2: Image.Image, tole
     
     return True
 
-def find_duplicate_frames(spritesheet_path: str, frame_width: int, frame_height: int, 
-                         total_frames: int, frames_per_row: int, tolerance: int = 0) -> Dict[int, List[int]]:
-    """
-    Find duplicate frames using direct pixel comparison
-    """
-    print(f"🔍 Searching for duplicate frames in {spritesheet_path}...")
-    
+def load_frames(spritesheet_path: str, frame_width: int, frame_height: int,
+                total_frames: int, frames_per_row: int) -> Dict[int, Image.Image]:
+    """Crop every frame that fits in the spritesheet, frame index -> RGBA image"""
+    frames = {}
     with Image.open(spritesheet_path) as spritesheet:
         spritesheet = spritesheet.convert('RGBA')
         
-        frames = {}  # Store frame objects for comparison
-        duplicates = {}
-        skipped_frames = set()
-        
-        frames_processed = 0
-        comparisons_made = 0
-        
-        # First pass: load all frames
         for frame_index in range(total_frames):
-            if frame_index in skipped_frames:
-                continue
-                
             row = frame_index // frames_per_row
             col = frame_index % frames_per_row
             
@@ -69,47 +66,226 @@ def find_duplicate_frames(spritesheet_path: str, frame_width: int, frame_height:
             if (x_end > spritesheet.width or y_end > spritesheet.height):
                 continue
             
-            frame = spritesheet.crop((x_start, y_start, x_end, y_end))
-            frames[frame_index] = frame
-            frames_processed += 1
+            frames[frame_index] = spritesheet.crop((x_start, y_start, x_end, y_end))
+    return frames
+
+def find_duplicate_frames(spritesheet_path: str, frame_width: int, frame_height: int, 
+                         total_frames: int, frames_per_row: int, tolerance: int = 0,
+                         frames: Optional[Dict[int, Image.Image]] = None) -> Dict[int, List[int]]:
+    """
+    Find duplicate frames using direct pixel comparison (frames already loaded from the spritesheet can be given)
+    """
+    print(f"🔍 Searching for duplicate frames in {spritesheet_path}...")
+    
+    if frames is None:
+        frames = load_frames(spritesheet_path, frame_width, frame_height, total_frames, frames_per_row)
+    
+    duplicates = {}
+    skipped_frames = set()
+    
+    frames_processed = len(frames)
+    comparisons_made = 0
+    
+    print(f"📥 Loaded {frames_processed} frames for comparison")
+    
+    if tolerance == 0:
+        duplicates = find_exact_duplicates(frames)
+        print(f"📊 Hashed {frames_processed} frames, found {len(duplicates)} sets of duplicates")
         
-        print(f"📥 Loaded {frames_processed} frames for comparison")
+        for base_frame, dupes in duplicates.items():
+            print(f"  🎯 Frame {base_frame} has {len(dupes)} duplicates: {dupes}")
+        
+        return duplicates
+    
+    if np is not None and frames:
+        duplicates = find_near_duplicates(frames, tolerance)
+        print(f"📊 Indexed {frames_processed} frames, found {len(duplicates)} sets of duplicates within tolerance {tolerance}")
         
-        # Second pass: compare frames
-        frame_indices = list(frames.keys())
+        for base_frame, dupes in duplicates.items():
+            print(f"  🎯 Frame {base_frame} has {len(dupes)} duplicates: {dupes}")
+        
+        return duplicates
+    
+    # Second pass: compare frames
+    frame_indices = list(frames.keys())
+    
+    for i in range(len(frame_indices)):
+        current_idx = frame_indices[i]
         
-        for i in range(len(frame_indices)):
-            current_idx = frame_indices[i]
+        if current_idx in skipped_frames:
+            continue
             
-            if current_idx in skipped_frames:
+        current_frame = frames[current_idx]
+        current_duplicates = []
+        
+        for j in range(i + 1, len(frame_indices)):
+            compare_idx = frame_indices[j]
+            
+            if compare_idx in skipped_frames:
                 continue
-                
-            current_frame = frames[current_idx]
-            current_duplicates = []
             
-            for j in range(i + 1, len(frame_indices)):
-                compare_idx = frame_indices[j]
-                
-                if compare_idx in skipped_frames:
-                    continue
-                
-                compare_frame = frames[compare_idx]
-                comparisons_made += 1
-                
-                if compare_frames_pixel_by_pixel(current_frame, compare_frame, tolerance):
-                    current_duplicates.append(compare_idx)
-                    skipped_frames.add(compare_idx)
-                    print(f"  🔄 Frame {compare_idx} is duplicate of {current_idx}")
+            compare_frame = frames[compare_idx]
+            comparisons_made += 1
             
-            if current_duplicates:
-                duplicates[current_idx] = current_duplicates
+            if compare_frames_pixel_by_pixel(current_frame, compare_frame, tolerance):
+                current_duplicates.append(compare_idx)
+                skipped_frames.add(compare_idx)
+                print(f"  🔄 Frame {compare_idx} is duplicate of {current_idx}")
         
-        print(f"📊 Made {comparisons_made} comparisons, found {len(duplicates)} sets of duplicates")
+        if current_duplicates:
+            duplicates[current_idx] = current_duplicates
+    
+    print(f"📊 Made {comparisons_made} comparisons, found {len(duplicates)} sets of duplicates")
+    
+    for base_frame, dupes in duplicates.items():
+        print(f"  🎯 Frame {base_frame} has {len(dupes)} duplicates: {dupes}")
+    
+    return duplicates
+
+def find_exact_duplicates(frames: Dict[int, Image.Image]) -> Dict[int, List[int]]:
+    """
+    Group identical frames by a hash of their pixels, confirmed by comparing the bytes.
+    Returns the same map as the pairwise comparison: first frame of each group -> later copies.
+    """
+    buckets = {}
+    duplicates = {}
+    
+    for frame_index in sorted(frames):
+        frame_bytes = frames[frame_index].tobytes()
+        bucket = buckets.setdefault(hashlib.blake2b(frame_bytes, digest_size=16).digest(), [])
         
-        for base_frame, dupes in duplicates.items():
-            print(f"  🎯 Frame {base_frame} has {len(dupes)} duplicates: {dupes}")
+        for base_index, base_bytes in bucket:
+            if base_bytes == frame_bytes:
+                duplicates.setdefault(base_index, []).append(frame_index)
+                print(f"  🔄 Frame {frame_index} is duplicate of {base_index}")
+                break
+        else:
+            bucket.append((frame_index, frame_bytes))
+    
+    return dict(sorted(duplicates.items()))
+
+def _block_signatures(pixels) -> "np.ndarray":
+    """Mean of every channel over a SIGNATURE_GRID x SIGNATURE_GRID grid of blocks, one row per frame"""
+    frame_count, height, width, channels = pixels.shape
+    row_starts = np.unique(np.linspace(0, height, SIGNATURE_GRID + 1, dtype=int)[:-1])
+    col_starts = np.unique(np.linspace(0, width, SIGNATURE_GRID + 1, dtype=int)[:-1])
+    
+    sums = np.add.reduceat(np.add.reduceat(pixels, row_starts, axis=1, dtype=np.int64), col_starts, axis=2)
+    block_heights = np.diff(np.append(row_starts, height))
+    block_widths = np.diff(np.append(col_starts, width))
+    means = sums / (block_heights[:, None, None] * block_widths[None, :, None])
+    return means.reshape(frame_count, -1)
+
+def find_near_duplicates(frames: Dict[int, Image.Image], tolerance: int) -> Dict[int, List[int]]:
+    """
+    Find frames whose channels all differ by at most tolerance from an earlier frame.
+    Candidates come from buckets of the frame mean and are pruned with block mean signatures
+    (a mean can't move more than the pixels it averages), the survivors are checked with a vectorized max abs diff.
+    Returns the same map as the pairwise comparison: first matching frame -> later near copies.
+    """
+    frame_indices = sorted(frames)
+    pixels = np.stack([np.asarray(frames[frame_index].convert('RGBA')) for frame_index in frame_indices])
+    signatures = _block_signatures(pixels)
+    
+    # Frame means within tolerance always land in the same or a neighbour bucket
+    bucket_keys = np.floor(pixels.mean(axis=(1, 2, 3)) / (tolerance + 1)).astype(np.int64)
+    buckets = defaultdict(list)
+    for position, key in enumerate(bucket_keys):
+        buckets[int(key)].append(position)
+    
+    duplicates = {}
+    skipped = np.zeros(len(frame_indices), dtype=bool)
+    for position, key in enumerate(bucket_keys):
+        if skipped[position]:
+            continue
         
-        return duplicates
+        candidates = sorted(candidate for neighbour in (key - 1, key, key + 1)
+                            for candidate in buckets.get(int(neighbour), ())
+                            if candidate > position and not skipped[candidate])
+        if not candidates:
+            continue
+        
+        candidates = np.array(candidates)
+        signature_diff = np.abs(signatures[candidates] - signatures[position]).max(axis=1)
+        candidates = candidates[signature_diff <= tolerance + 1e-6]
+        if len(candidates) == 0:
+            continue
+        
+        pixel_diff = np.abs(pixels[candidates].astype(np.int16) - pixels[position].astype(np.int16))
+        matches = candidates[pixel_diff.reshape(len(candidates), -1).max(axis=1) <= tolerance]
+        if len(matches) == 0:
+            continue
+        
+        skipped[matches] = True
+        duplicates[frame_indices[position]] = [frame_indices[match] for match in matches]
+        for match in matches:
+            print(f"  🔄 Frame {frame_indices[match]} is duplicate of {frame_indices[position]}")
+    
+    return duplicates
+
+def find_mirrored_bodies(frames: Dict[int, Image.Image], duplicates: Dict[int, List[int]],
+                         body_model: BodyModel) -> Dict[int, List[int]]:
+    """
+    Flip the body types whose frames are all horizontal mirrors of other kept frames.
+    Their entries are pointed at the mirror frames and the body Flipped flag is toggled,
+    mirroring a whole cell keeps its content anchored so the offsets stay the same.
+    Returns the frames no longer referenced in the duplicates map format: mirror frame -> freed frames.
+    """
+    base_of = {dupe: base for base, dupes in duplicates.items() for dupe in dupes}
+    kept_frames = [frame_index for frame_index in sorted(frames) if frame_index not in base_of]
+    
+    buckets = {}
+    for frame_index in kept_frames:
+        frame_bytes = frames[frame_index].tobytes()
+        buckets.setdefault(hashlib.blake2b(frame_bytes, digest_size=16).digest(), []).append((frame_index, frame_bytes))
+    
+    mirror_of = {}
+    for frame_index in kept_frames:
+        mirrored_bytes = ImageOps.mirror(frames[frame_index]).tobytes()
+        for candidate_index, candidate_bytes in buckets.get(hashlib.blake2b(mirrored_bytes, digest_size=16).digest(), ()):
+            if candidate_bytes == mirrored_bytes:
+                mirror_of[frame_index] = candidate_index
+                break
+    
+    references = {body_type: set() for body_type, _ in body_model.body_types()}
+    for body_type, _, entries in body_model.animation_frames():
+        references[body_type].update(base_of.get(entry['Frame'], entry['Frame']) for entry in entries if 'Frame' in entry)
+    
+    freed = {}
+    # Left first, it's the body Fashion Sense is usually asked to flip. The portrait is drawn from frame 0
+    # and would be flipped along with its body, so FrontBody and frame 0 are left alone
+    for body_type in reversed(list(references)):
+        used_frames = references[body_type]
+        body = body_model.data[body_type]
+        if not used_frames or 'Portrait' in body:
+            continue
+        if any(frame_index not in mirror_of or mirror_of[frame_index] in freed for frame_index in used_frames):
+            continue
+        
+        mirrored_frames = {mirror_of[frame_index] for frame_index in used_frames}
+        other_frames = {0}.union(*(frames_used for other_type, frames_used in references.items() if other_type != body_type))
+        releasable = used_frames - mirrored_frames - other_frames
+        if not releasable:
+            continue
+        
+        body['Flipped'] = not body.get('Flipped', False)
+        for entry_body_type, _, entries in body_model.animation_frames():
+            if entry_body_type != body_type:
+                continue
+            for entry in entries:
+                if 'Frame' in entry:
+                    entry['Frame'] = mirror_of[base_of.get(entry['Frame'], entry['Frame'])]
+        body_model.mark_modified()
+        
+        references[body_type] = mirrored_frames
+        for frame_index in releasable:
+            freed[frame_index] = mirror_of[frame_index]
+        print(f"  🪞 {body_type} mirrors {len(used_frames)} kept frames, Flipped: {body['Flipped']}, frees {len(releasable)} frames")
+    
+    mirrored = {}
+    for frame_index, mirror_index in sorted(freed.items()):
+        mirrored.setdefault(mirror_index, []).append(frame_index)
+    return mirrored
 
 def debug_compare_specific_frames(spritesheet_path: str, frame_indices: List[int], 
                                  frame_width: int, frame_height: int, frames_per_row: int):
@@ -191,35 +367,39 @@ def create_optimized_spritesheet(spritesheet_path: str, output_path: str,
     
     with Image.open(spritesheet_path) as spritesheet:
         spritesheet = spritesheet.convert('RGBA')
-        optimized_sheet = Image.new('RGBA', (new_sheet_width, new_sheet_height), (0, 0, 0, 0))
+        optimized_sheet = FrameGridSheet(output_path, new_sheet_width, new_sheet_height, frame_height)
         
-        # Copy unique frames in order
-        for new_index, original_index in enumerate(frames_to_keep):
-            row = original_index // frames_per_row
-            col = original_index % frames_per_row
+        try:
+            # Copy unique frames in order
+            for new_index, original_index in enumerate(frames_to_keep):
+                row = original_index // frames_per_row
+                col = original_index % frames_per_row
             
-            # Position in the original spritesheet
-            x_start = col * frame_width
-            y_start = row * frame_height
-            x_end = x_start + frame_width
-            y_end = y_start + frame_height
+                # Position in the original spritesheet
+                x_start = col * frame_width
+                y_start = row * frame_height
+                x_end = x_start + frame_width
+                y_end = y_start + frame_height
             
-            if (x_end > spritesheet.width or y_end > spritesheet.height):
-                continue
+                if (x_end > spritesheet.width or y_end > spritesheet.height):
+                    continue
             
-            frame = spritesheet.crop((x_start, y_start, x_end, y_end))
+                frame = spritesheet.crop((x_start, y_start, x_end, y_end))
             
-            # Position in the new spritesheet
-            new_row = new_index // frames_per_row
-            new_col = new_index % frames_per_row
-            new_x = new_col * frame_width
-            new_y = new_row * frame_height
+                # Position in the new spritesheet
+                new_row = new_index // frames_per_row
+                new_col = new_index % frames_per_row
+                new_x = new_col * frame_width
+                new_y = new_row * frame_height
             
-            optimized_sheet.paste(frame, (new_x, new_y))
+                optimized_sheet.paste(frame, (new_x, new_y))
+        except BaseException:
+            optimized_sheet.abort()
+            raise
         
         print(f"✅ Copied {len(frames_to_keep)} unique frames to new spritesheet")
     
-    optimized_sheet.save(output_path, 'PNG')
+    optimized_sheet.close()
     print(f"✅ Optimized spritesheet: {total_frames} → {new_total_frames} frames")
     
     # Debug: show mapping
@@ -230,57 +410,68 @@ def create_optimized_spritesheet(spritesheet_path: str, output_path: str,
     
     return new_total_frames, frame_mapping
 
-def update_json_frame_references(body_json_path: str, frame_mapping: Dict[int, int]):
-    """Update frame numbers in JSON to use deduplicated references"""
+def update_json_frame_references(body_json_path: str, frame_mapping: Dict[int, int], body_model: Optional[BodyModel] = None):
+    """Update frame numbers in the body model to use deduplicated references (loaded from and saved to body.json if not given)"""
     print(f"📝 Updating JSON frame references...")
     
-    with open(body_json_path, 'r', encoding='utf-8') as f:
-        body_data = json.load(f)
+    save_to_file = body_model is None
+    if save_to_file:
+        body_model = BodyModel.load(body_json_path)
     
     frames_updated = 0
-    
-    def update_animation_frames(animations):
-        nonlocal frames_updated
-        for anim in animations:
-            if 'Frame' in anim:
-                original_frame = anim['Frame']
+    current_body_type = None
+    for body_type, animation_list, frames in body_model.animation_frames():
+        if body_type != current_body_type:
+            current_body_type = body_type
+            print(f"  Updating {body_type}:")
+        
+        for frame in frames:
+            if 'Frame' in frame:
+                original_frame = frame['Frame']
                 if original_frame in frame_mapping:
                     new_frame = frame_mapping[original_frame]
                     if new_frame != original_frame:
-                        anim['Frame'] = new_frame
+                        frame['Frame'] = new_frame
                         frames_updated += 1
                         print(f"    {original_frame} → {new_frame}")
-
-    for body_type in ['FrontBody', 'RightBody', 'BackBody', 'LeftBody']:
-        if body_type in body_data:
-            print(f"  Updating {body_type}:")
-            
-            if 'IdleAnimation' in body_data[body_type]:
-                update_animation_frames(body_data[body_type]['IdleAnimation'])
-            if 'MovementAnimation' in body_data[body_type]:
-                update_animation_frames(body_data[body_type]['MovementAnimation'])
-
-    # Save updated JSON
-    with open(body_json_path, 'w', encoding='utf-8') as f:
-        json.dump(body_data, f, indent=2)
+    
+    body_model.mark_modified()
+    if save_to_file:
+        body_model.write(body_json_path)
     
     print(f"✅ Updated {frames_updated} frame references in JSON")
 
 def deduplicate_frames(output_dir: str, frame_width: int, frame_height: int, 
-                      total_frames: int, frames_per_row: int = 32, tolerance: int = 0) -> int:
-    """Main function to deduplicate frames in a sprite output"""
+                      total_frames: int, frames_per_row: int = 32, tolerance: int = 0,
+                      body_model: Optional[BodyModel] = None, mirrored: bool = False) -> int:
+    """Main function to deduplicate frames in a sprite output, with mirrored the body types drawn as mirrors of other frames are flipped"""
     print(f"🎯 Deduplicating frames in: {output_dir}")
     
     spritesheet_path = os.path.join(output_dir, "body.png")
     body_json_path = os.path.join(output_dir, "body.json")
     
-    if not os.path.exists(spritesheet_path) or not os.path.exists(body_json_path):
+    if not os.path.exists(spritesheet_path) or (body_model is None and not os.path.exists(body_json_path)):
         print(f"⚠️ Skipping deduplication: required files not found")
         return total_frames
     
     # Find duplicates
+    frames = load_frames(spritesheet_path, frame_width, frame_height, total_frames, frames_per_row)
     duplicates = find_duplicate_frames(spritesheet_path, frame_width, frame_height, 
-                                     total_frames, frames_per_row, tolerance)
+                                     total_frames, frames_per_row, tolerance, frames)
+    
+    if mirrored:
+        save_to_file = body_model is None
+        model = BodyModel.load(body_json_path) if save_to_file else body_model
+        mirror_duplicates = find_mirrored_bodies(frames, duplicates, model)
+        if save_to_file and model.modified:
+            model.write(body_json_path)
+        
+        # Freed frames and their own copies now map to the mirror frame
+        for mirror_index, freed_frames in mirror_duplicates.items():
+            for frame_index in freed_frames:
+                duplicates.setdefault(mirror_index, []).extend([frame_index] + duplicates.pop(frame_index, []))
+        if mirror_duplicates:
+            print(f"🪞 Mirrored bodies free {sum(len(freed) for freed in mirror_duplicates.values())} more frames")
     
     if not duplicates:
         print("ℹ️ No duplicate frames found")
@@ -297,19 +488,24 @@ def deduplicate_frames(output_dir: str, frame_width: int, frame_height: int,
     os.replace(temp_spritesheet, spritesheet_path)
     
     # Update JSON
-    update_json_frame_references(body_json_path, frame_mapping)
+    update_json_frame_references(body_json_path, frame_mapping, body_model)
     
     print(f"🎉 Deduplication complete: {total_frames} → {new_total_frames} frames")
     
     return new_total_frames
 
-def batch_deduplicate_frames(base_output_dir: str, spritesheet_mapping: Dict) -> Dict:
-    """Deduplicate frames for all generated spritesheets"""
+def batch_deduplicate_frames(base_output_dir: str, spritesheet_mapping: Dict, tolerance: int = 0,
+                             mirrored: bool = False) -> Dict:
+    """Deduplicate frames for all generated spritesheets, frames whose channels differ by at most tolerance are merged"""
     print(f"🚀 Starting frame deduplication for {len(spritesheet_mapping)} spritesheets...")
     
     updated_mapping = spritesheet_mapping.copy()
     
     for variant_name, sprite_data in spritesheet_mapping.items():
+        if sprite_data.get('recolor_of'):
+            print(f"🎨 Skipping deduplication for {variant_name}: recolor of {sprite_data['recolor_of']}, synced afterwards")
+            continue
+        
         output_dir = sprite_data['directory']
         frame_width = sprite_data['max_width']
         frame_height = sprite_data['max_height']
@@ -318,7 +514,8 @@ def batch_deduplicate_frames(base_output_dir: str, spritesheet_mapping: Dict) ->
         
         print(f"\n--- Deduplicating {variant_name} ---")
         try:
-            new_total_frames = deduplicate_frames(output_dir, frame_width, frame_height, total_frames, frames_per_row)
+            new_total_frames = deduplicate_frames(output_dir, frame_width, frame_height, total_frames, frames_per_row,
+                                                  tolerance, sprite_data.get('body_model'), mirrored)
             
             if new_total_frames and new_total_frames != total_frames:
                 updated_mapping[variant_name]['total_frames'] = new_total_frames
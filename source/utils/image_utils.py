@@ -2,10 +2,15 @@
 # Description: Image processing utilities
 
 from pathlib import Path
-from PIL import Image, ImageFont
+from PIL import Image, ImageChops, ImageFont
 from config.debug_config import DEBUG_CONFIG
 from config.settings import app_settings
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 def load_pixel_font():
     """Load the pixel font with proper settings for crisp rendering using app settings."""
     font_paths = [
@@ -28,25 +33,61 @@ def load_pixel_font():
     except:
         return None
 
-def find_foot_average(image: Image.Image, width: int, height: int):
-    data = image.load()
-    left_foot_pos = None
-    right_foot_pos = None
+# Point lookup tables turning a band into a mode '1' mask
+_VISIBLE_LUT = [0] + [255] * 255
+_EQUALS_LUTS = {value: [255 if v == value else 0 for v in range(256)] for value in (0, 255)}
+
+def _channel_mask(band: Image.Image, value: int) -> Image.Image:
+    """Mode '1' mask of the pixels where the band has exactly this value"""
+    return band.point(_EQUALS_LUTS[value], '1')
+
+def _color_mask(bands, red=None, green=None, blue=None) -> Image.Image:
+    """Mode '1' mask of the visible pixels matching the given channel values (None matches any value)"""
+    r, g, b, a = bands
+    mask = a.point(_VISIBLE_LUT, '1')
+    for band, value in ((r, red), (g, green), (b, blue)):
+        if value is not None:
+            mask = ImageChops.logical_and(mask, _channel_mask(band, value))
+    return mask
+
+def _region(image: Image.Image, width: int, height: int) -> Image.Image:
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    if image.size != (width, height):
+        image = image.crop((0, 0, width, height))
+    return image
+
+def _pack_rgba(r: int, g: int, b: int, a: int):
+    return np.array([r, g, b, a], dtype=np.uint8).view(np.uint32)[0]
+
+def _packed_pixels(image: Image.Image, width: int, height: int):
+    """One uint32 per pixel, so colors are compared with a single mask and compare"""
+    return np.ascontiguousarray(np.asarray(_region(image, width, height))).view(np.uint32)[..., 0]
+
+def _last_row(mask):
+    rows = np.flatnonzero(mask.any(axis=1))
+    return int(rows[-1]) if len(rows) else None
+
+def _find_foot_rows(image: Image.Image, width: int, height: int):
+    """Lowest row of the left foot (red) and right foot (blue) pixels, magenta/white count for both feet"""
+    if np is not None:
+        pixels = _packed_pixels(image, width, height)
+        visible = (pixels & _pack_rgba(0, 0, 0, 255)) != 0
+        rgb = pixels & _pack_rgba(255, 255, 255, 0)
+        both_feet = (pixels & _pack_rgba(255, 0, 255, 0)) == _pack_rgba(255, 0, 255, 0)
+        left_foot = visible & (both_feet | (rgb == _pack_rgba(255, 0, 0, 0)))
+        right_foot = visible & (both_feet | (rgb == _pack_rgba(0, 0, 255, 0)))
+        return _last_row(left_foot), _last_row(right_foot)
     
-    for y in range(height):
-        for x in range(width):
-            r, g, b, a = data[x, y]
-            if a > 0:
-                if r == 255 and g == 0 and b == 0:
-                    left_foot_pos = y
-                elif r == 0 and g == 0 and b == 255:
-                    right_foot_pos = y
-                elif r == 255 and g == 0 and b == 255:
-                    left_foot_pos = y
-                    right_foot_pos = y
-                elif r == 255 and b == 255:
-                    left_foot_pos = y
-                    right_foot_pos = y
+    # Pillow band operations, getbbox of each color mask
+    bands = _region(image, width, height).split()
+    both_feet = _color_mask(bands, red=255, blue=255)
+    left_bbox = ImageChops.logical_or(_color_mask(bands, 255, 0, 0), both_feet).getbbox()
+    right_bbox = ImageChops.logical_or(_color_mask(bands, 0, 0, 255), both_feet).getbbox()
+    return (left_bbox[3] - 1 if left_bbox else None), (right_bbox[3] - 1 if right_bbox else None)
+
+def find_foot_average(image: Image.Image, width: int, height: int):
+    left_foot_pos, right_foot_pos = _find_foot_rows(image, width, height)
     
     if left_foot_pos is None and right_foot_pos is None:
         return None
@@ -59,13 +100,12 @@ def find_foot_average(image: Image.Image, width: int, height: int):
         return right_foot_pos
 
 def find_white_point(image: Image.Image, width: int, height: int):
-    data = image.load()
-    
-    for y in range(height):
-        for x in range(width):
-            r, g, b, a = data[x, y]
-            if a > 0:
-                if r == 255 and g == 255 and b == 255:
-                    return y
+    """First row with a visible white pixel"""
+    if np is not None:
+        pixels = _packed_pixels(image, width, height)
+        white = ((pixels & _pack_rgba(0, 0, 0, 255)) != 0) & ((pixels & _pack_rgba(255, 255, 255, 0)) == _pack_rgba(255, 255, 255, 0))
+        rows = np.flatnonzero(white.any(axis=1))
+        return int(rows[0]) if len(rows) else None
     
-    return None
\ No newline at end of file
+    white_bbox = _color_mask(_region(image, width, height).split(), 255, 255, 255).getbbox()
+    return white_bbox[1] if white_bbox else None
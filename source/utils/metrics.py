@@ -14,6 +14,8 @@ class ProcessingMetrics:
     errors_count: int = 0
     warnings_count: int = 0
     files_by_type: Dict[str, int] = field(default_factory=dict)
+    reused_animations: int = 0
+    reused_frames: int = 0
     
     def record_processing(self, frames_count: int, processing_time: float, file_type: str = "unknown"):
         self.files_processed += 1
@@ -27,6 +29,10 @@ class ProcessingMetrics:
     def record_warning(self):
         self.warnings_count += 1
     
+    def record_frame_reuse(self, reused_animations: int, reused_frames: int):
+        self.reused_animations += reused_animations
+        self.reused_frames += reused_frames
+    
     def get_summary(self) -> Dict[str, Any]:
         avg_time = self.processing_time / max(self.files_processed, 1)
         return {
@@ -36,7 +42,9 @@ class ProcessingMetrics:
             'errors_count': self.errors_count,
             'warnings_count': self.warnings_count,
             'files_by_type': self.files_by_type,
-            'average_time_per_file': avg_time
+            'average_time_per_file': avg_time,
+            'reused_animations': self.reused_animations,
+            'reused_frames': self.reused_frames
         }
     
     def print_summary(self):
@@ -50,6 +58,8 @@ class ProcessingMetrics:
         print(f"   Warnings: {summary['warnings_count']}")
         if summary['files_by_type']:
             print(f"   Files by type: {summary['files_by_type']}")
+        if summary['reused_animations']:
+            print(f"   Reused animations: {summary['reused_animations']} ({summary['reused_frames']} frames not rendered)")
 
 def time_execution(description: str = ""):
     def decorator(func):
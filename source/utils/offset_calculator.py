@@ -2,13 +2,48 @@
 # Description: Sprite offset calculation
 
 import os
+import json
+import threading
+from functools import lru_cache
 from pathlib import Path
 from PIL import Image
 from data_models.animation_models import AnimationSet
 from .image_utils import find_foot_average, find_white_point
+from .sheet_cache import sprite_sheet_cache
+from .path_utils import file_digest
 from config.settings import app_settings
 
-def calculate_sprite_offsets(anim_set: AnimationSet, max_width: int, max_height: int) -> tuple:
+class ReferenceFootAnalysis:
+    """
+    Foot row of the body position reference, found once with find_foot_average.
+    The reference is always centered on the canvas, so when the canvas holds the whole reference
+    its foot row is the reference foot row shifted by the centering offset.
+    """
+    def __init__(self, reference_sprite: Image.Image):
+        self.reference_sprite = reference_sprite
+        self.width, self.height = reference_sprite.size
+        self.reference_foot_average = find_foot_average(reference_sprite, self.width, self.height)
+        self._foot_average_by_canvas = {}
+    
+    def foot_average(self, canvas_width: int, canvas_height: int):
+        """Same result as find_foot_average on the reference centered in a canvas_width x canvas_height frame"""
+        key = (canvas_width, canvas_height)
+        if key not in self._foot_average_by_canvas:
+            offset_x = (canvas_width - self.width) // 2
+            offset_y = (canvas_height - self.height) // 2
+            if canvas_width >= self.width and canvas_height >= self.height:
+                foot_average = None if self.reference_foot_average is None else self.reference_foot_average + offset_y
+            else:
+                # Part of the reference is cut off by the canvas
+                centered_reference_frame = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, 0))
+                centered_reference_frame.paste(self.reference_sprite, (offset_x, offset_y))
+                foot_average = find_foot_average(centered_reference_frame, canvas_width, canvas_height)
+            self._foot_average_by_canvas[key] = foot_average
+        return self._foot_average_by_canvas[key]
+
+@lru_cache(maxsize=None)
+def find_reference_path():
+    """Location of body_position_references.png, resolved once per process"""
     reference_paths = [
         app_settings.IMAGES_DIR / "body_position_references.png",
         Path("./images/body_position_references.png"),
@@ -16,19 +51,89 @@ def calculate_sprite_offsets(anim_set: AnimationSet, max_width: int, max_height:
         Path(__file__).parent.parent / "images" / "body_position_references.png"
     ]
     
-    reference_path = None
     for path in reference_paths:
         if path.exists():
-            reference_path = path
-            break
+            return path
+    return None
+
+@lru_cache(maxsize=None)
+def get_reference_foot_analysis(reference_path) -> ReferenceFootAnalysis:
+    """Process wide foot analysis of a reference image"""
+    return ReferenceFootAnalysis(sprite_sheet_cache.get(reference_path))
+
+class ShadowFootCache:
+    """
+    White point (foot row) of the first Idle shadow frame keyed by shadow content hash and frame size,
+    so identical shadow sheets (recolor variants, repeated runs) are only analyzed once.
+    Optionally loaded from and saved to a JSON file between runs.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.cache_path = None
+        self._white_points = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+    
+    def white_point(self, shadow_path, frame_width: int, frame_height: int):
+        """First white row of the shadow first frame, None if it has no white pixel"""
+        key = f"{file_digest(shadow_path)}:{frame_width}x{frame_height}"
+        with self._lock:
+            if key in self._white_points:
+                self.hits += 1
+                return self._white_points[key]
+            self.misses += 1
+        
+        first_frame = sprite_sheet_cache.get(shadow_path).crop((0, 0, frame_width, frame_height))
+        white_point = find_white_point(first_frame, frame_width, frame_height)
+        with self._lock:
+            self._white_points[key] = white_point
+            self._dirty = True
+        return white_point
+    
+    def load(self, cache_path):
+        """Use a persisted cache file, it's created on save if it doesn't exist"""
+        self.cache_path = str(cache_path)
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                white_points = json.load(f)
+            with self._lock:
+                self._white_points.update(white_points)
+            print(f"👣 Loaded {len(white_points)} cached shadow foot positions from {self.cache_path}")
+        except Exception as e:
+            print(f"⚠️ Could not load shadow foot cache {self.cache_path}: {e}")
+    
+    def save(self):
+        if not self.cache_path or not self._dirty:
+            return
+        try:
+            with self._lock:
+                white_points = dict(self._white_points)
+                self._dirty = False
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(white_points, f, indent=2, sort_keys=True)
+            print(f"💾 Saved {len(white_points)} shadow foot positions to {self.cache_path}")
+        except Exception as e:
+            print(f"⚠️ Could not save shadow foot cache {self.cache_path}: {e}")
+    
+    def print_summary(self):
+        print(f"👣 Shadow foot cache: {self.hits} hits, {self.misses} misses")
+
+# Global shadow foot cache instance
+shadow_foot_cache = ShadowFootCache()
+
+def calculate_sprite_offsets(anim_set: AnimationSet, max_width: int, max_height: int) -> tuple:
+    reference_path = find_reference_path()
     
     if not reference_path:
         print(f"⚠️ body_position_references.png not found")
         return 0, 0, 0
     
     try:
-        reference_sprite = Image.open(reference_path).convert('RGBA')
-        REFERENCE_WIDTH, REFERENCE_HEIGHT = reference_sprite.size
+        reference = get_reference_foot_analysis(reference_path)
+        REFERENCE_WIDTH, REFERENCE_HEIGHT = reference.width, reference.height
         REFERENCE_CENTER_X = REFERENCE_WIDTH // 2
         REFERENCE_CENTER_Y = REFERENCE_HEIGHT // 2
         
@@ -70,37 +175,32 @@ def calculate_foot_difference(anim_set: AnimationSet, max_width: int, max_height
         return 0
     
     try:
-        shadow_sprite = Image.open(shadow_path).convert('RGBA')
-        reference_sprite = Image.open(reference_path).convert('RGBA')
-        
         idle_anim = next((a for a in anim_set.animations if a.name.lower() == "idle"), None)
         if idle_anim and idle_anim.frame_width > 0:
             frame_width = idle_anim.frame_width
             frame_height = idle_anim.frame_height
         else:
-            frame_width, frame_height = shadow_sprite.size
-        
-        first_frame = shadow_sprite.crop((0, 0, frame_width, frame_height))
+            frame_width, frame_height = sprite_sheet_cache.get(shadow_path).size
         
-        centered_pokemon_frame = Image.new('RGBA', (max_width, max_height), (0, 0, 0, 0))
         pokemon_offset_x = (max_width - frame_width) // 2
         pokemon_offset_y = (max_height - frame_height) // 2
-        centered_pokemon_frame.paste(first_frame, (pokemon_offset_x, pokemon_offset_y))
         
-        centered_reference_frame = Image.new('RGBA', (max_width, max_height), (0, 0, 0, 0))
-        ref_width, ref_height = reference_sprite.size
-        ref_offset_x = (max_width - ref_width) // 2
-        ref_offset_y = (max_height - ref_height) // 2
-        centered_reference_frame.paste(reference_sprite, (ref_offset_x, ref_offset_y))
-        
-        pokemon_white_point = find_white_point(centered_pokemon_frame, max_width, max_height)
+        if max_width >= frame_width and max_height >= frame_height:
+            # The frame fits the canvas, its white point is just shifted by the centering offset
+            frame_white_point = shadow_foot_cache.white_point(shadow_path, frame_width, frame_height)
+            pokemon_white_point = None if frame_white_point is None else frame_white_point + pokemon_offset_y
+        else:
+            first_frame = sprite_sheet_cache.get(shadow_path).crop((0, 0, frame_width, frame_height))
+            centered_pokemon_frame = Image.new('RGBA', (max_width, max_height), (0, 0, 0, 0))
+            centered_pokemon_frame.paste(first_frame, (pokemon_offset_x, pokemon_offset_y))
+            pokemon_white_point = find_white_point(centered_pokemon_frame, max_width, max_height)
         if pokemon_white_point is None:
             print(f"⚠️ No white point found in {shadow_path}")
             return 0
         
         pokemon_foot_position = pokemon_white_point + 1
         
-        reference_foot_avg = find_foot_average(centered_reference_frame, max_width, max_height)
+        reference_foot_avg = get_reference_foot_analysis(reference_path).foot_average(max_width, max_height)
         if reference_foot_avg is None:
             print(f"⚠️ No foot pixels found in reference")
             return 0
@@ -1,8 +1,11 @@
 # Author: HeartoLazor
 # Description: Path and file name utilities
 
+import os
 import csv
 import sys
+import hashlib
+import threading
 from pathlib import Path
 
 current_dir = Path(__file__).parent
@@ -160,4 +163,35 @@ def is_variant_enabled_in_minimal(pokemon_data: dict, variant_index: int) -> boo
     if variant_index - 1 < len(pokemon_data["minimal_variants"]):
         return pokemon_data["minimal_variants"][variant_index - 1] == 1
     
-    return True  # Default to enabled if index out of range
\ No newline at end of file
+    return True  # Default to enabled if index out of range
+
+class FileDigestCache:
+    """SHA-1 of file contents, cached per path while the file size and modification time don't change"""
+    def __init__(self):
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def digest(self, path) -> str:
+        path = os.path.abspath(str(path))
+        stat = os.stat(path)
+        version = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(block)
+        digest = sha1.hexdigest()
+        with self._lock:
+            self._digests[path] = (version, digest)
+        return digest
+
+# Global file digest cache instance
+file_digest_cache = FileDigestCache()
+
+def file_digest(path) -> str:
+    """SHA-1 of the file content, hashed again only when the file changes"""
+    return file_digest_cache.digest(path)
@@ -0,0 +1,314 @@
+# Author: HeartoLazor
+# Description: Spritesheet PNG output profiles (RGBA, palette indexed) and streaming writer
+
+import io
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PNG_PROFILES = ["rgba", "palette"]
+
+def to_palette_image(image: Image.Image) -> Optional[Image.Image]:
+    """
+    Losslessly convert an RGBA image to a palette (P mode) image with per entry alpha (tRNS).
+    Returns None if the image has more than 256 distinct RGBA colors.
+    """
+    rgba = image if image.mode == 'RGBA' else image.convert('RGBA')
+    colors = rgba.getcolors(256)
+    if colors is None:
+        return None
+
+    if np is not None:
+        pixels = np.asarray(rgba).view(np.uint32).reshape(-1)
+        palette, indices = np.unique(pixels, return_inverse=True)
+        palette_bytes = palette.astype(np.uint32).tobytes()
+        index_bytes = indices.astype(np.uint8).tobytes()
+    else:
+        palette = sorted(color for _, color in colors)
+        lookup = {color: index for index, color in enumerate(palette)}
+        palette_bytes = bytes(channel for color in palette for channel in color)
+        index_bytes = bytes(lookup[pixel] for pixel in rgba.getdata())
+
+    paletted = Image.frombytes('P', rgba.size, index_bytes)
+    paletted.putpalette(palette_bytes, 'RGBA')
+    return paletted
+
+def _palette_bits(color_count: int) -> int:
+    for bits in (1, 2, 4):
+        if color_count <= (1 << bits):
+            return bits
+    return 8
+
+class PngBandWriter:
+    """
+    Writes an RGBA PNG to disk in bands of rows, each band is filtered and deflated as soon as it arrives.
+    Only the current band is kept in memory, so peak memory depends on the band size instead of the sheet size.
+    """
+    def __init__(self, output_path, width: int, height: int, compress_level: int = 6):
+        self.output_path = str(output_path)
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._previous_row = None
+        self._compressor = zlib.compressobj(compress_level)
+        self._file = open(self.output_path, 'wb')
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        # 8 bit RGBA, no interlace
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+    def _chunk(self, chunk_type: bytes, data: bytes):
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF))
+
+    def _filter_rows(self, band: Image.Image) -> bytes:
+        if np is None:
+            stride = self.width * 4
+            raw = band.tobytes()
+            return b''.join(b'\x00' + raw[y * stride:(y + 1) * stride] for y in range(band.height))
+
+        # Per row choice between None, Sub and Up filters (minimum sum of absolute differences)
+        rows = np.asarray(band).reshape(band.height, self.width * 4)
+        previous = self._previous_row if self._previous_row is not None else np.zeros(self.width * 4, dtype=np.uint8)
+        above = np.vstack([previous[None], rows[:-1]])
+
+        sub = rows.copy()
+        sub[:, 4:] -= rows[:, :-4]
+        candidates = np.stack([rows, sub, rows - above])
+        costs = np.abs(candidates.view(np.int8).astype(np.int32)).sum(axis=2)
+        filter_types = costs.argmin(axis=0)
+
+        filtered = np.empty((band.height, self.width * 4 + 1), dtype=np.uint8)
+        filtered[:, 0] = filter_types
+        filtered[:, 1:] = candidates[filter_types, np.arange(band.height)]
+        self._previous_row = rows[-1].copy()
+        return filtered.tobytes()
+
+    def write_band(self, band: Image.Image):
+        """Filter and compress the next rows of the image"""
+        if band.mode != 'RGBA':
+            band = band.convert('RGBA')
+        if band.width != self.width or self.rows_written + band.height > self.height:
+            raise ValueError(f"Band {band.size} does not fit {self.output_path} at row {self.rows_written}")
+
+        compressed = self._compressor.compress(self._filter_rows(band))
+        if compressed:
+            self._chunk(b'IDAT', compressed)
+        self.rows_written += band.height
+
+    def close(self) -> int:
+        """Finish the PNG, returns the written size in bytes"""
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"Only {self.rows_written}/{self.height} rows written to {self.output_path}")
+            self._chunk(b'IDAT', self._compressor.flush())
+            self._chunk(b'IEND', b'')
+        finally:
+            self._file.close()
+        return os.path.getsize(self.output_path)
+
+    def abort(self):
+        """Close the file without finishing the PNG and delete the partial file"""
+        self._file.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+class PngWriter:
+    """
+    Writes spritesheets with the configured output profile and keeps the size of every written file.
+    The palette profile falls back to RGBA when the sheet has more than 256 colors or the RGBA file is smaller.
+    """
+    def __init__(self, profile: str = "rgba", encoder_threads: int = 2, stream_min_bytes: int = 64 * 1024 * 1024):
+        self.profile = profile
+        self.encoder_threads = encoder_threads
+        self.stream_min_bytes = stream_min_bytes
+        self._sizes: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending_slots = None
+        self._pending: List[Tuple[str, object]] = []
+
+    def save(self, image: Image.Image, output_path, profile: Optional[str] = None) -> int:
+        """Save the image as PNG, returns the written size in bytes"""
+        output_path = str(output_path)
+        if (profile or self.profile) != "palette":
+            image.save(output_path, 'PNG')
+            return self._record(output_path, "rgba", os.path.getsize(output_path), None)
+
+        rgba_buffer = io.BytesIO()
+        image.save(rgba_buffer, 'PNG')
+        rgba_size = rgba_buffer.tell()
+
+        paletted = to_palette_image(image)
+        if paletted is not None:
+            palette_buffer = io.BytesIO()
+            paletted.save(palette_buffer, 'PNG', bits=_palette_bits(len(paletted.getcolors(256))))
+            if palette_buffer.tell() < rgba_size:
+                with open(output_path, 'wb') as f:
+                    f.write(palette_buffer.getbuffer())
+                return self._record(output_path, "palette", palette_buffer.tell(), rgba_size)
+
+        with open(output_path, 'wb') as f:
+            f.write(rgba_buffer.getbuffer())
+        return self._record(output_path, "rgba", rgba_size, rgba_size)
+
+    def should_stream(self, width: int, height: int) -> bool:
+        """Big RGBA sheets are written in bands, the palette profile needs the whole sheet to build its palette"""
+        return self.profile != "palette" and 0 < self.stream_min_bytes <= width * height * 4
+
+    def save_bands(self, output_path, width: int, height: int, bands: Iterable[Image.Image]) -> int:
+        """Stream the bands (top to bottom) into an RGBA PNG, returns the written size in bytes"""
+        band_writer = PngBandWriter(output_path, width, height)
+        try:
+            for band in bands:
+                band_writer.write_band(band)
+        except BaseException:
+            band_writer.abort()
+            raise
+        size = band_writer.close()
+        return self._record(str(output_path), "rgba", size, None)
+
+    def save_async(self, image: Image.Image, output_path, profile: Optional[str] = None):
+        """
+        Queue the image to be encoded by the encoder threads (zlib releases the GIL, so rendering continues meanwhile).
+        Blocks while too many images are pending to keep memory bounded, the image must not be modified afterwards.
+        """
+        if self.encoder_threads <= 0:
+            self.save(image, output_path, profile)
+            return
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.encoder_threads, thread_name_prefix="png-encoder")
+            self._pending_slots = threading.BoundedSemaphore(self.encoder_threads * 2)
+
+        self._pending_slots.acquire()
+        future = self._executor.submit(self.save, image, output_path, profile)
+        future.add_done_callback(lambda _: self._pending_slots.release())
+        self._pending.append((str(output_path), future))
+
+    def wait(self) -> int:
+        """Wait for all queued images, report failures in submission order and return the failed count"""
+        pending, self._pending = self._pending, []
+        failed = 0
+        for output_path, future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                print(f"❌ Failed to write {output_path}: {e}")
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        return failed
+
+    def _record(self, output_path: str, mode: str, size: int, rgba_size: Optional[int]) -> int:
+        with self._lock:
+            self._sizes[os.path.abspath(output_path)] = {'mode': mode, 'size': size, 'rgba_size': rgba_size}
+        return size
+
+    def get_size_info(self, output_path) -> Optional[Dict]:
+        with self._lock:
+            return self._sizes.get(os.path.abspath(str(output_path)))
+
+    def clear(self):
+        with self._lock:
+            self._sizes.clear()
+
+    def print_savings(self, spritesheet_mapping: Dict):
+        """Print the final body.png size of every variant compared with plain RGBA"""
+        if self.profile != "palette":
+            return
+
+        print(f"\n💾 PNG output profile: {self.profile}")
+        total_size = 0
+        total_rgba_size = 0
+        for variant_name, sprite_data in spritesheet_mapping.items():
+            info = self.get_size_info(os.path.join(sprite_data['directory'], "body.png"))
+            if not info or not info['rgba_size']:
+                continue
+            total_size += info['size']
+            total_rgba_size += info['rgba_size']
+            saved = 100 * (1 - info['size'] / info['rgba_size'])
+            print(f"   {variant_name}: {info['size'] / 1024:.1f} KB ({info['mode']}) vs {info['rgba_size'] / 1024:.1f} KB RGBA, saved {saved:.0f}%")
+
+        if total_rgba_size:
+            saved = 100 * (1 - total_size / total_rgba_size)
+            print(f"   Total: {total_size / 1024:.1f} KB vs {total_rgba_size / 1024:.1f} KB RGBA, saved {saved:.0f}%")
+
+class FrameGridSheet:
+    """
+    Spritesheet assembled frame by frame on a grid.
+    Small sheets are built in memory and saved with the PNG writer, big sheets are streamed
+    one row of frames at a time, so frames must be pasted in row order.
+    """
+    def __init__(self, output_path, sheet_width: int, sheet_height: int, frame_height: int, writer: Optional[PngWriter] = None):
+        self.output_path = str(output_path)
+        self.width = sheet_width
+        self.height = sheet_height
+        self.frame_height = frame_height
+        self.writer = writer or png_writer
+        self.streaming = self.writer.should_stream(sheet_width, sheet_height)
+
+        if self.streaming:
+            self._band_writer = PngBandWriter(self.output_path, sheet_width, sheet_height)
+            self._band_top = 0
+            self._band = self._new_band()
+        else:
+            self._sheet = Image.new('RGBA', (sheet_width, sheet_height), (0, 0, 0, 0))
+
+    def _new_band(self) -> Image.Image:
+        return Image.new('RGBA', (self.width, min(self.frame_height, self.height - self._band_top)), (0, 0, 0, 0))
+
+    def _flush_band(self):
+        self._band_writer.write_band(self._band)
+        self._band_top += self._band.height
+        if self._band_top < self.height:
+            self._band = self._new_band()
+
+    def paste(self, frame: Image.Image, position: Tuple[int, int]):
+        """Paste a frame at its sheet position"""
+        if not self.streaming:
+            self._sheet.paste(frame, position)
+            return
+
+        x, y = position
+        if y < self._band_top:
+            raise ValueError(f"Frame at y={y} pasted after its row was written to {self.output_path}")
+        while y >= self._band_top + self._band.height:
+            self._flush_band()
+        self._band.paste(frame, (x, y - self._band_top))
+
+    def close(self) -> int:
+        """Write the remaining rows, returns the written size in bytes"""
+        if not self.streaming:
+            return self.writer.save(self._sheet, self.output_path)
+
+        try:
+            while self._band_top < self.height:
+                self._flush_band()
+        except BaseException:
+            self.abort()
+            raise
+        size = self._band_writer.close()
+        return self.writer._record(self.output_path, "rgba", size, None)
+
+    def abort(self):
+        """Drop the sheet after a failure, a streamed sheet closes its file and deletes the partial PNG"""
+        if self.streaming:
+            self._band_writer.abort()
+        else:
+            self._sheet = None
+
+# Global PNG writer instance
+png_writer = PngWriter()
@@ -0,0 +1,138 @@
+# Author: HeartoLazor
+# Description: Palette recolor detection and fast path for shiny/altcolor variants
+
+import os
+import filecmp
+from typing import Dict, List, Optional
+from PIL import Image
+from data_models.animation_models import AnimationSet
+from data_models.body_model import BodyModel
+from .sheet_cache import sprite_sheet_cache
+from .png_output import png_writer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def _pack_rgb(pixels):
+    return (pixels[..., 0].astype(np.uint32) << 16) | (pixels[..., 1].astype(np.uint32) << 8) | pixels[..., 2].astype(np.uint32)
+
+def _unpack_rgb(keys):
+    return np.stack([(keys >> 16) & 0xFF, (keys >> 8) & 0xFF, keys & 0xFF], axis=-1).astype(np.uint8)
+
+def is_recolor_candidate(base_set: AnimationSet, variant_set: AnimationSet) -> bool:
+    """Check that both variants share geometry, frame tables, offsets and shadow"""
+    if (base_set.max_width != variant_set.max_width or base_set.max_height != variant_set.max_height or
+            base_set.global_offsets != variant_set.global_offsets or
+            base_set.animations != variant_set.animations or
+            base_set.stardew_animations != variant_set.stardew_animations):
+        return False
+
+    # Offsets come from the Idle shadow, it must be the same file content
+    for animation in base_set.animations:
+        if animation.name == "Idle":
+            base_shadow = os.path.join(base_set.directory, animation.shadow_path)
+            variant_shadow = os.path.join(variant_set.directory, animation.shadow_path)
+            if os.path.exists(base_shadow) != os.path.exists(variant_shadow):
+                return False
+            if os.path.exists(base_shadow) and not filecmp.cmp(base_shadow, variant_shadow, shallow=False):
+                return False
+    return True
+
+def find_color_mapping(base_sheet_paths: List[str], variant_sheet_paths: List[str]) -> Optional[Dict[int, int]]:
+    """
+    Detect a color mapping (packed RGB -> packed RGB) that turns the base sheets into the variant sheets.
+    Returns None if alpha masks differ, alpha is not binary or a base color maps to several variant colors.
+    """
+    if np is None:
+        return None
+
+    color_mapping = {}
+    for base_path, variant_path in zip(base_sheet_paths, variant_sheet_paths):
+        base = np.asarray(sprite_sheet_cache.get(base_path))
+        variant = np.asarray(sprite_sheet_cache.get(variant_path))
+        if base.shape != variant.shape:
+            return None
+
+        alpha = base[..., 3]
+        if not np.array_equal(alpha, variant[..., 3]):
+            return None
+        # Partially transparent pixels are blended on paste, a remap of the output would not match
+        if np.count_nonzero((alpha != 0) & (alpha != 255)):
+            return None
+
+        opaque = alpha == 255
+        pairs = (_pack_rgb(base[opaque]).astype(np.uint64) << 32) | _pack_rgb(variant[opaque]).astype(np.uint64)
+        pairs = np.unique(pairs)
+        base_colors = (pairs >> 32).astype(np.uint32)
+        variant_colors = (pairs & 0xFFFFFFFF).astype(np.uint32)
+        if len(np.unique(base_colors)) != len(base_colors):
+            return None
+
+        for base_color, variant_color in zip(base_colors.tolist(), variant_colors.tolist()):
+            if color_mapping.setdefault(base_color, variant_color) != variant_color:
+                return None
+
+    return color_mapping
+
+def apply_color_mapping(image: Image.Image, color_mapping: Dict[int, int]) -> Optional[Image.Image]:
+    """Remap the opaque pixels of an RGBA image, returns None if a color is not in the mapping"""
+    pixels = np.array(image.convert('RGBA'))
+    opaque = pixels[..., 3] != 0
+    colors, inverse = np.unique(_pack_rgb(pixels[opaque]), return_inverse=True)
+
+    mapped = np.empty_like(colors)
+    for index, color in enumerate(colors.tolist()):
+        if color not in color_mapping:
+            return None
+        mapped[index] = color_mapping[color]
+
+    rgb = pixels[..., :3]
+    rgb[opaque] = _unpack_rgb(mapped[inverse.reshape(-1)])
+    return Image.fromarray(pixels, 'RGBA')
+
+def sync_recolor_variant(base_data: Dict, variant_data: Dict) -> bool:
+    """Rebuild a recolor variant from the final (post-processed) base body.png and body model"""
+    base_dir = base_data['directory']
+    variant_dir = variant_data['directory']
+
+    with Image.open(os.path.join(base_dir, "body.png")) as base_sheet:
+        recolored = apply_color_mapping(base_sheet, variant_data['color_mapping'])
+    if recolored is None:
+        print(f"⚠️ Base spritesheet has colors outside the recolor mapping, keeping {variant_dir} as generated")
+        return False
+
+    base_model = base_data.get('body_model') or BodyModel.load(os.path.join(base_dir, "body.json"))
+    variant_model = variant_data.get('body_model')
+    if variant_model is None:
+        variant_model = BodyModel.load(os.path.join(variant_dir, "body.json"))
+        variant_data['body_model'] = variant_model
+    variant_model.replace_with(base_model, keep_keys=('Name', 'Tags'))
+
+    png_writer.save(recolored, os.path.join(variant_dir, "body.png"))
+    return True
+
+def batch_sync_recolor_variants(spritesheet_mapping: Dict) -> Dict:
+    """Apply the base variant optimizations (bbox, dedup, POT) to its recolor variants"""
+    recolor_variants = {name: data for name, data in spritesheet_mapping.items() if data.get('recolor_of')}
+    if not recolor_variants:
+        return spritesheet_mapping
+
+    print(f"🎨 Syncing {len(recolor_variants)} recolor variants from their base variants...")
+
+    updated_mapping = spritesheet_mapping.copy()
+    for variant_name, variant_data in recolor_variants.items():
+        base_data = spritesheet_mapping.get(variant_data['recolor_of'])
+        if not base_data:
+            continue
+        try:
+            if sync_recolor_variant(base_data, variant_data):
+                for key in ('max_width', 'max_height', 'total_frames', 'frames_per_row', 'frame_mapping'):
+                    if key in base_data:
+                        updated_mapping[variant_name][key] = base_data[key]
+                print(f"✅ {variant_name}: recolored from {variant_data['recolor_of']}")
+        except Exception as e:
+            print(f"❌ Failed to sync recolor variant {variant_name}: {e}")
+
+    return updated_mapping
@@ -0,0 +1,71 @@
+# Author: HeartoLazor
+# Description: LRU cache of decoded RGBA sprite sheets
+
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image
+from config.settings import app_settings
+
+class SpriteSheetCache:
+    """
+    Size bounded LRU cache of decoded RGBA sheets keyed by path.
+    Cached images are shared, callers must copy them before drawing on them.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sheets = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sheet_bytes(sheet: Image.Image) -> int:
+        return sheet.width * sheet.height * len(sheet.getbands())
+
+    def get(self, sheet_path) -> Image.Image:
+        """Return the decoded RGBA sheet, decoding it only if it's not cached"""
+        key = os.path.abspath(str(sheet_path))
+        with self._lock:
+            sheet = self._sheets.get(key)
+            if sheet is not None:
+                self._sheets.move_to_end(key)
+                self.hits += 1
+                return sheet
+            self.misses += 1
+
+        with Image.open(key) as source:
+            sheet = source.convert('RGBA')
+        sheet_bytes = self._sheet_bytes(sheet)
+
+        if sheet_bytes > self.max_bytes:
+            # Bigger than the whole budget, don't flush the cache for it
+            return sheet
+
+        with self._lock:
+            if key not in self._sheets:
+                self._sheets[key] = sheet
+                self.current_bytes += sheet_bytes
+                self._evict()
+            return self._sheets.get(key, sheet)
+
+    def _evict(self):
+        # Evicted sheets are only dropped, not closed: callers may still hold them, garbage collection frees them
+        while self.current_bytes > self.max_bytes and self._sheets:
+            _, evicted = self._sheets.popitem(last=False)
+            self.current_bytes -= self._sheet_bytes(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._sheets.clear()
+            self.current_bytes = 0
+
+    def print_summary(self):
+        print(f"🗃️ Sheet cache: {self.hits} hits, {self.misses} misses, {self.evictions} evictions, "
+              f"{len(self._sheets)} sheets ({self.current_bytes / (1024 * 1024):.1f}/{self.max_bytes / (1024 * 1024):.0f} MB)")
+
+# Global sheet cache instance
+sprite_sheet_cache = SpriteSheetCache(app_settings.SHEET_CACHE_MAX_MB * 1024 * 1024)